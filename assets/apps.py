@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AssetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assets'
+
+    def ready(self):
+        # Import signals so that they are connected.
+        import assets.signals
@@ -1,8 +1,80 @@
-from django.db import models
+import functools
+import logging
+from decimal import Decimal
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, models, transaction
+from django.db.models import Exists, OuterRef, Subquery, Sum
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from django.utils.functional import cached_property
 from finance.models import ExpenseRecord, ExpenseCategory
 
+logger = logging.getLogger(__name__)
+
+TOTAL_INVESTMENT_CACHE_KEY = 'assets:total_investment'
+# Saves only clear the cache of the process that made them, so a per-process cache needs a short expiry
+TOTAL_INVESTMENT_CACHE_TIMEOUT = getattr(settings, 'ASSETS_CACHE_TIMEOUT', 60)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_depreciation_category_id():
+    """Return the id of the 'Depreciation' expense category, creating it on first use."""
+    category, _created = ExpenseCategory.objects.get_or_create(
+        name='Depreciation',
+        defaults={'is_direct_cost': False}
+    )
+    return category.pk
+
+
+@functools.lru_cache(maxsize=None)
+def _get_maintenance_category_id():
+    """Return the id of the 'Maintenance' expense category, creating it on first use."""
+    category, _created = ExpenseCategory.objects.get_or_create(
+        name='Maintenance',
+        defaults={'is_direct_cost': False}
+    )
+    return category.pk
+
+
+class DepreciationRecordQuerySet(models.QuerySet):
+    def as_arrays(self):
+        """
+        Return the records as NumPy columns for reporting.
+
+        Reads a narrow values_list instead of building a model instance per row and
+        returns ``(asset_ids, dates, depreciation_amounts, book_values)``.
+        """
+        rows = list(self.values_list('asset_id', 'date', 'depreciation_amount', 'book_value'))
+        if not rows:
+            return (np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[D]'),
+                    np.empty(0), np.empty(0))
+
+        asset_ids, dates, depreciation_amounts, book_values = zip(*rows)
+        return (
+            np.array(asset_ids, dtype=np.int64),
+            np.array(dates, dtype='datetime64[D]'),
+            np.array(depreciation_amounts, dtype=np.float64),
+            np.array(book_values, dtype=np.float64),
+        )
+
+
+class DepreciationRecordManager(models.Manager.from_queryset(DepreciationRecordQuerySet)):
+    """Default manager that joins the asset and expense used by __str__ and list views."""
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('asset', 'related_expense')
+
+
+class AssetMaintenanceManager(models.Manager):
+    """Default manager that joins the asset and expense used by __str__ and list views."""
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('asset', 'related_expense')
+
 
 class Asset(models.Model):
     """Model for fixed assets."""
@@ -13,32 +85,33 @@ class Asset(models.Model):
     CATEGORY_EQUIPMENT = 'EQUIPMENT'
     CATEGORY_OTHER = 'OTHER'
 
-    CATEGORY_CHOICES = [
+    CATEGORY_CHOICES = (
         (CATEGORY_LAND, _('Land')),
         (CATEGORY_BUILDING, _('Building')),
         (CATEGORY_MACHINERY, _('Machinery')),
         (CATEGORY_VEHICLE, _('Vehicle')),
         (CATEGORY_EQUIPMENT, _('Equipment')),
         (CATEGORY_OTHER, _('Other')),
-    ]
+    )
+    _CATEGORY_LABELS = dict(CATEGORY_CHOICES)
 
     STATUS_ACTIVE = 'ACTIVE'
     STATUS_SOLD = 'SOLD'
     STATUS_RETIRED = 'RETIRED'
 
-    STATUS_CHOICES = [
+    STATUS_CHOICES = (
         (STATUS_ACTIVE, _('Active')),
         (STATUS_SOLD, _('Sold')),
         (STATUS_RETIRED, _('Retired')),
-    ]
+    )
 
     DEPRECIATION_SLM = 'SLM'
     DEPRECIATION_WDV = 'WDV'
 
-    DEPRECIATION_METHOD_CHOICES = [
+    DEPRECIATION_METHOD_CHOICES = (
         (DEPRECIATION_SLM, _('Straight Line Method')),
         (DEPRECIATION_WDV, _('Written Down Value Method')),
-    ]
+    )
 
     asset_id = models.AutoField(primary_key=True)
     name = models.CharField(_('Asset Name'), max_length=100)
@@ -58,6 +131,26 @@ class Asset(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def get_category_display(self):
+        # Dict lookup instead of Django's rebuild of the choices mapping on every call
+        return str(self._CATEGORY_LABELS.get(self.category, self.category))
+
+    @cached_property
+    def slm_monthly_depreciation(self):
+        """Fixed monthly depreciation under the Straight Line Method."""
+        if self.useful_life_years > 0:
+            return (self.purchase_cost - self.salvage_value) / (self.useful_life_years * 12)
+        return 0
+
+    @cached_property
+    def wdv_monthly_rate(self):
+        """Monthly rate applied to the book value under the Written Down Value Method."""
+        if self.useful_life_years > 0 and self.salvage_value < self.purchase_cost:
+            # Calculate annual rate: (1 - (Salvage/Cost)^(1/Life))
+            annual_rate = 1 - (float(self.salvage_value) / float(self.purchase_cost)) ** (1 / self.useful_life_years)
+            return Decimal(str(annual_rate)) / 12
+        return Decimal('0')
+
     def calculate_monthly_depreciation(self, book_value=None):
         """Calculate monthly depreciation amount based on method."""
         if book_value is None:
@@ -65,43 +158,163 @@ class Asset(models.Model):
 
         if self.depreciation_method == self.DEPRECIATION_SLM:
             # Straight Line Method
-            if self.useful_life_years > 0:
-                return (self.purchase_cost - self.salvage_value) / (self.useful_life_years * 12)
-            return 0
+            return self.slm_monthly_depreciation
 
         elif self.depreciation_method == self.DEPRECIATION_WDV:
             # Written Down Value Method
-            # Calculate annual rate: (1 - (Salvage/Cost)^(1/Life))
-            if self.useful_life_years > 0 and self.salvage_value < self.purchase_cost:
-                annual_rate = 1 - (self.salvage_value / self.purchase_cost) ** (1 / self.useful_life_years)
-                return book_value * (annual_rate / 12)
-            return 0
+            return book_value * self.wdv_monthly_rate
 
         return 0
 
+    @transaction.atomic
     def run_monthly_depreciation(self, for_date=None):
         """Run depreciation calculation for a specific month."""
         if not for_date:
             for_date = timezone.now().date().replace(day=1) - timezone.timedelta(days=1)  # Last day of previous month
 
-        # Check if depreciation already exists for this month
+        # Lock the asset row so concurrent runs for the same asset serialize on the check below
+        Asset.objects.select_for_update().only('asset_id').get(pk=self.pk)
+
+        # Check if depreciation already exists for this month (date range keeps the (asset, date) index usable)
+        month_start = for_date.replace(day=1)
+        next_month_start = month_start + relativedelta(months=1)
         if DepreciationRecord.objects.filter(
                 asset=self,
-                date__year=for_date.year,
-                date__month=for_date.month
+                date__gte=month_start,
+                date__lt=next_month_start
         ).exists():
             return None
 
         # Get latest depreciation record to determine current book value
-        latest_record = DepreciationRecord.objects.filter(asset=self).order_by('-date').first()
+        latest_record = DepreciationRecord.objects.filter(asset=self).order_by('-date').values(
+            'book_value', 'accumulated_depreciation'
+        ).first()
 
         if latest_record:
-            book_value = latest_record.book_value
-            accumulated_depreciation = latest_record.accumulated_depreciation
+            book_value = latest_record['book_value']
+            accumulated_depreciation = latest_record['accumulated_depreciation']
         else:
             book_value = self.purchase_cost
             accumulated_depreciation = 0
 
+        depreciation_record = self._build_depreciation_record(for_date, book_value, accumulated_depreciation)
+        if depreciation_record is not None:
+            depreciation_record.save()
+
+        return depreciation_record
+
+    @classmethod
+    @transaction.atomic
+    def run_monthly_depreciation_bulk(cls, for_date=None):
+        """
+        Run depreciation for every active asset in one pass.
+
+        Pending assets and their latest book value are fetched (and locked) in a
+        single query, then the expense and depreciation rows are written with
+        bulk_create inside one transaction. Returns the created DepreciationRecord objects.
+        """
+        if not for_date:
+            for_date = timezone.now().date().replace(day=1) - timezone.timedelta(days=1)  # Last day of previous month
+
+        latest_records = DepreciationRecord.objects.filter(asset=OuterRef('pk')).order_by('-date')
+        month_start = for_date.replace(day=1)
+        next_month_start = month_start + relativedelta(months=1)
+        already_run = DepreciationRecord.objects.filter(
+            asset=OuterRef('pk'),
+            date__gte=month_start,
+            date__lt=next_month_start
+        )
+        # Only the columns used by the calculation and the expense text; skips the description/notes TextFields
+        assets = cls.objects.select_for_update().only(
+            'asset_id', 'name', 'category', 'purchase_cost', 'salvage_value',
+            'useful_life_years', 'depreciation_method', 'status'
+        ).filter(status=cls.STATUS_ACTIVE).filter(~Exists(already_run)).annotate(
+            latest_book_value=Subquery(latest_records.values('book_value')[:1]),
+            latest_accumulated_depreciation=Subquery(latest_records.values('accumulated_depreciation')[:1]),
+        )
+
+        records = []
+        for asset in assets:
+            if asset.latest_book_value is not None:
+                book_value = asset.latest_book_value
+                accumulated_depreciation = asset.latest_accumulated_depreciation
+            else:
+                book_value = asset.purchase_cost
+                accumulated_depreciation = 0
+
+            depreciation_record = asset._build_depreciation_record(for_date, book_value, accumulated_depreciation)
+            if depreciation_record is not None:
+                records.append(depreciation_record)
+
+        if not records:
+            return []
+
+        # Insert the expenses first so each depreciation row carries its FK in the same INSERT
+        expenses = ExpenseRecord.bulk_create_with_buffalo_totals(
+            [record.build_related_expense() for record in records], batch_size=500
+        )
+        for record, expense in zip(records, expenses):
+            record.related_expense = expense
+        records = DepreciationRecord.objects.bulk_create(records, batch_size=500)
+
+        # The depreciation ids only exist now; point each expense back at its record.
+        for record, expense in zip(records, expenses):
+            expense.related_record_id = record.pk
+        ExpenseRecord.objects.bulk_update(expenses, ['related_record_id'], batch_size=500)
+        return records
+
+    @classmethod
+    def project_depreciation(cls, months):
+        """
+        Project the book value of every active asset over the next ``months`` months.
+
+        Uses the closed-form SLM (book - n * charge) and WDV (book * (1 - rate) ** n)
+        formulas on NumPy arrays, starting from each asset's latest book value and
+        never dropping below salvage value. Returns ``(asset_ids, book_values)`` where
+        ``book_values`` has one row per asset and one column per projected month.
+        """
+        latest_records = DepreciationRecord.objects.filter(asset=OuterRef('pk')).order_by('-date')
+        rows = list(cls.objects.filter(status=cls.STATUS_ACTIVE).annotate(
+            latest_book_value=Subquery(latest_records.values('book_value')[:1]),
+        ).values_list(
+            'asset_id', 'purchase_cost', 'salvage_value', 'useful_life_years',
+            'depreciation_method', 'latest_book_value'
+        ))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, months))
+
+        asset_ids, costs, salvages, lives, methods, latest_book_values = zip(*rows)
+        cost = np.array(costs, dtype=np.float64)
+        salvage = np.array(salvages, dtype=np.float64)
+        life = np.array(lives, dtype=np.float64)
+        start = np.array([
+            float(book_value) if book_value is not None else float(purchase_cost)
+            for purchase_cost, book_value in zip(costs, latest_book_values)
+        ])
+        is_wdv = np.array(methods) == cls.DEPRECIATION_WDV
+        has_life = life > 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slm_charge = np.where(has_life, (cost - salvage) / (life * 12), 0.0)
+            wdv_rate = np.where(
+                has_life & (salvage < cost),
+                (1 - (salvage / cost) ** (1 / life)) / 12,
+                0.0
+            )
+
+        elapsed = np.arange(1, months + 1)
+        book_values = np.where(
+            is_wdv[:, None],
+            start[:, None] * (1 - wdv_rate[:, None]) ** elapsed,
+            start[:, None] - slm_charge[:, None] * elapsed
+        )
+        # Book value never drops below salvage value (or below where it already is)
+        book_values = np.maximum(book_values, np.minimum(salvage, start)[:, None])
+
+        return np.array(asset_ids), book_values
+
+    def _build_depreciation_record(self, for_date, book_value, accumulated_depreciation):
+        """Return an unsaved DepreciationRecord for the month, or None if fully depreciated."""
         # Check if book value has reached or is below salvage value
         if book_value <= self.salvage_value:
             return None
@@ -117,8 +330,7 @@ class Asset(models.Model):
         accumulated_depreciation += monthly_depreciation
         book_value -= monthly_depreciation
 
-        # Create depreciation record
-        depreciation_record = DepreciationRecord.objects.create(
+        return DepreciationRecord(
             asset=self,
             date=for_date,
             depreciation_amount=monthly_depreciation,
@@ -126,7 +338,14 @@ class Asset(models.Model):
             book_value=book_value
         )
 
-        return depreciation_record
+    @classmethod
+    def total_investment(cls):
+        """Sum of all assets' purchase costs, cached until any asset is saved or deleted"""
+        total = cache.get(TOTAL_INVESTMENT_CACHE_KEY)
+        if total is None:
+            total = cls.objects.aggregate(total=Sum('purchase_cost'))['total'] or Decimal('0.00')
+            cache.set(TOTAL_INVESTMENT_CACHE_KEY, total, TOTAL_INVESTMENT_CACHE_TIMEOUT)
+        return total
 
     def __str__(self):
         return f"{self.name} ({self.get_category_display()})"
@@ -135,6 +354,10 @@ class Asset(models.Model):
         verbose_name = _('Asset')
         verbose_name_plural = _('Assets')
         ordering = ['-purchase_date', 'name']
+        indexes = [
+            # Backs the monthly capex total (purchase_date range) and the default ordering
+            models.Index(fields=['-purchase_date', 'name'], name='asset_purchase_date_name_idx'),
+        ]
 
 
 class DepreciationRecord(models.Model):
@@ -150,32 +373,41 @@ class DepreciationRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+    objects = DepreciationRecordManager()
 
-        # Create expense record if it doesn't exist
-        if not self.related_expense:
+    def save(self, *args, **kwargs):
+        # Create the expense record before saving so the link is written in the same INSERT
+        expense = None
+        if not self.related_expense_id:
             try:
-                depreciation_category, _ = ExpenseCategory.objects.get_or_create(
-                    name='Depreciation',
-                    defaults={'is_direct_cost': False}
-                )
-
-                expense = ExpenseRecord.objects.create(
-                    date=self.date,
-                    category=depreciation_category,
-                    description=f"Depreciation for {self.asset.name}",
-                    amount=self.depreciation_amount,
-                    related_module='DepreciationRecord',
-                    related_record_id=self.depreciation_id,
-                    notes=f"Monthly depreciation for {self.asset.name} ({self.asset.get_category_display()})"
-                )
-
+                # Savepoint so a failed insert doesn't break an enclosing transaction
+                with transaction.atomic():
+                    expense = self.build_related_expense()
+                    expense.save()
                 self.related_expense = expense
-                self.save(update_fields=['related_expense'])
-            except Exception as e:
-                # Log the error
-                print(f"Error creating expense record: {e}")
+            except DatabaseError:
+                expense = None
+                logger.exception('Failed to create expense record for depreciation of asset %s', self.asset_id)
+
+        super().save(*args, **kwargs)
+        # A new record only has its id now; point the expense back at it.
+        if expense and expense.related_record_id is None:
+            ExpenseRecord.objects.filter(pk=expense.pk, related_record_id__isnull=True).update(
+                related_record_id=self.pk
+            )
+            expense.related_record_id = self.pk
+
+    def build_related_expense(self):
+        """Return the unsaved ExpenseRecord that books this depreciation."""
+        return ExpenseRecord(
+            date=self.date,
+            category_id=_get_depreciation_category_id(),
+            description=f"Depreciation for {self.asset.name}",
+            amount=self.depreciation_amount,
+            related_module='DepreciationRecord',
+            related_record_id=self.pk if self.pk else None,
+            notes=f"Monthly depreciation for {self.asset.name} ({self.asset.get_category_display()})"
+        )
 
     def __str__(self):
         return f"{self.asset} - Depreciation on {self.date}: {self.depreciation_amount}"
@@ -186,6 +418,10 @@ class DepreciationRecord(models.Model):
         ordering = ['-date', 'asset']
         # Ensure only one depreciation record per asset per month
         unique_together = [['asset', 'date']]
+        indexes = [
+            # Serves the "latest record for an asset" lookup as a backward index scan
+            models.Index(fields=['asset', '-date'], name='deprec_asset_date_desc_idx'),
+        ]
 
 
 class AssetMaintenance(models.Model):
@@ -203,32 +439,35 @@ class AssetMaintenance(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+    objects = AssetMaintenanceManager()
 
-        # Create expense record if it doesn't exist
-        if not self.related_expense and self.cost > 0:
+    def save(self, *args, **kwargs):
+        # Create the expense record before saving so the link is written in the same INSERT
+        expense = None
+        if not self.related_expense_id and self.cost > 0:
             try:
-                maintenance_category, _ = ExpenseCategory.objects.get_or_create(
-                    name='Maintenance',
-                    defaults={'is_direct_cost': False}
-                )
-
-                expense = ExpenseRecord.objects.create(
-                    date=self.date,
-                    category=maintenance_category,
-                    description=f"Maintenance for {self.asset.name}: {self.description}",
-                    amount=self.cost,
-                    related_module='AssetMaintenance',
-                    related_record_id=self.maintenance_id,
-                    notes=self.notes
-                )
-
+                # Savepoint so a failed insert doesn't break an enclosing transaction
+                with transaction.atomic():
+                    expense = ExpenseRecord.objects.create(
+                        date=self.date,
+                        category_id=_get_maintenance_category_id(),
+                        description=f"Maintenance for {self.asset.name}: {self.description}",
+                        amount=self.cost,
+                        related_module='AssetMaintenance',
+                        related_record_id=self.pk if self.pk else None,
+                        notes=self.notes
+                    )
                 self.related_expense = expense
-                self.save(update_fields=['related_expense'])
-            except Exception as e:
-                # Log the error
-                print(f"Error creating expense record: {e}")
+            except DatabaseError:
+                logger.exception('Failed to create expense record for maintenance of asset %s', self.asset_id)
+
+        super().save(*args, **kwargs)
+        # A new record only has its id now; point the expense back at it.
+        if expense and expense.related_record_id is None:
+            ExpenseRecord.objects.filter(pk=expense.pk, related_record_id__isnull=True).update(
+                related_record_id=self.pk
+            )
+            expense.related_record_id = self.pk
 
     def __str__(self):
         return f"{self.asset} - Maintenance on {self.date}: {self.description}"
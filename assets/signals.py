@@ -0,0 +1,29 @@
+"""
+assets/signals.py
+
+Clears the cached expense category ids used for depreciation and maintenance when an expense category is deleted,
+so the next posting looks the category up (or re-creates it) again, and drops the cached total investment
+whenever an asset changes.
+"""
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from finance.models import ExpenseCategory
+from .models import (
+    TOTAL_INVESTMENT_CACHE_KEY, Asset, _get_depreciation_category_id, _get_maintenance_category_id,
+)
+
+
+@receiver(post_delete, sender=ExpenseCategory)
+def forget_asset_expense_categories(sender, instance, **kwargs):
+    """Drop the cached category ids; a deleted category may be one of them."""
+    _get_depreciation_category_id.cache_clear()
+    _get_maintenance_category_id.cache_clear()
+
+
+@receiver([post_save, post_delete], sender=Asset)
+def clear_total_investment_cache(sender, instance, **kwargs):
+    """Drop the cached total so ROI picks up bought, repriced or deleted assets."""
+    cache.delete(TOTAL_INVESTMENT_CACHE_KEY)
@@ -1,3 +1,119 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from finance.models import ExpenseRecord
+from .models import Asset, AssetMaintenance, DepreciationRecord, _get_depreciation_category_id, _get_maintenance_category_id
+
+
+class AssetDepreciationTest(TestCase):
+    def setUp(self):
+        # The expense categories are memoized per process; start each test from a clean cache.
+        _get_depreciation_category_id.cache_clear()
+        _get_maintenance_category_id.cache_clear()
+        self.tractor = Asset.objects.create(
+            name="Tractor",
+            category=Asset.CATEGORY_MACHINERY,
+            purchase_date=date(2024, 1, 1),
+            purchase_cost=Decimal("120000.00"),
+            useful_life_years=10,
+            salvage_value=Decimal("12000.00")
+        )
+        self.shed = Asset.objects.create(
+            name="Shed",
+            category=Asset.CATEGORY_BUILDING,
+            purchase_date=date(2024, 1, 1),
+            purchase_cost=Decimal("60000.00"),
+            useful_life_years=5,
+            salvage_value=Decimal("0.00")
+        )
+
+    def test_run_monthly_depreciation_links_expense(self):
+        record = self.tractor.run_monthly_depreciation(date(2024, 1, 31))
+        self.assertEqual(record.depreciation_amount, Decimal("900.00"))
+        self.assertEqual(record.book_value, Decimal("119100.00"))
+        self.assertEqual(record.related_expense.amount, Decimal("900.00"))
+        self.assertEqual(record.related_expense.category.name, "Depreciation")
+        # The expense points back at the record it books.
+        self.assertEqual(ExpenseRecord.objects.get(pk=record.related_expense_id).related_record_id, record.pk)
+        # A second run for the same month is a no-op.
+        self.assertIsNone(self.tractor.run_monthly_depreciation(date(2024, 1, 31)))
+
+    def test_maintenance_links_expense(self):
+        maintenance = AssetMaintenance.objects.create(
+            asset=self.tractor, date=date(2024, 3, 5), description="Oil change", cost=Decimal("450.00")
+        )
+        expense = ExpenseRecord.objects.get(pk=maintenance.related_expense_id)
+        self.assertEqual((expense.related_module, expense.related_record_id), ('AssetMaintenance', maintenance.pk))
+        self.assertEqual(expense.category.name, "Maintenance")
+
+    def test_bulk_depreciation_matches_per_asset_run(self):
+        self.tractor.run_monthly_depreciation(date(2024, 1, 31))
+        records = Asset.run_monthly_depreciation_bulk(date(2024, 2, 29))
+        self.assertEqual(len(records), 2)
+
+        tractor_record = DepreciationRecord.objects.get(asset=self.tractor, date=date(2024, 2, 29))
+        self.assertEqual(tractor_record.accumulated_depreciation, Decimal("1800.00"))
+        self.assertEqual(tractor_record.book_value, Decimal("118200.00"))
+        shed_record = DepreciationRecord.objects.get(asset=self.shed, date=date(2024, 2, 29))
+        self.assertEqual(shed_record.book_value, Decimal("59000.00"))
+        self.assertEqual(ExpenseRecord.objects.filter(related_module='DepreciationRecord').count(), 3)
+        self.assertIsNotNone(shed_record.related_expense_id)
+        self.assertEqual(
+            dict(ExpenseRecord.objects.filter(pk__in=[r.related_expense_id for r in records])
+                 .values_list('pk', 'related_record_id')),
+            {r.related_expense_id: r.pk for r in records}
+        )
+
+    def test_bulk_depreciation_skips_processed_and_inactive_assets(self):
+        Asset.run_monthly_depreciation_bulk(date(2024, 1, 31))
+        self.shed.status = Asset.STATUS_SOLD
+        self.shed.save()
+        self.assertEqual(Asset.run_monthly_depreciation_bulk(date(2024, 1, 31)), [])
+        records = Asset.run_monthly_depreciation_bulk(date(2024, 2, 29))
+        self.assertEqual([record.asset for record in records], [self.tractor])
+
+    def test_wdv_depreciation_uses_book_value(self):
+        self.tractor.depreciation_method = Asset.DEPRECIATION_WDV
+        self.tractor.save()
+        # (1 - (12000 / 120000) ** (1 / 10)) / 12 ~= 1.714% per month
+        first = self.tractor.run_monthly_depreciation(date(2024, 1, 31))
+        first.refresh_from_db()
+        self.assertEqual(first.depreciation_amount, Decimal("2056.72"))
+        second = self.tractor.run_monthly_depreciation(date(2024, 2, 29))
+        self.assertLess(second.depreciation_amount, first.depreciation_amount)
+
+    def test_project_depreciation_matches_monthly_run(self):
+        self.tractor.run_monthly_depreciation(date(2024, 1, 31))
+        asset_ids, book_values = Asset.project_depreciation(120)
+        self.assertEqual(book_values.shape, (2, 120))
+
+        tractor_row = book_values[list(asset_ids).index(self.tractor.pk)]
+        # Starts from the latest recorded book value and stops at salvage value.
+        self.assertAlmostEqual(tractor_row[0], 118200.0)
+        self.assertAlmostEqual(tractor_row[-1], 12000.0)
+
+        shed_row = book_values[list(asset_ids).index(self.shed.pk)]
+        self.assertAlmostEqual(shed_row[0], 59000.0)
+        self.assertAlmostEqual(shed_row[59], 0.0)
+
+    def test_depreciation_records_as_arrays(self):
+        Asset.run_monthly_depreciation_bulk(date(2024, 1, 31))
+        Asset.run_monthly_depreciation_bulk(date(2024, 2, 29))
+        asset_ids, dates, amounts, book_values = DepreciationRecord.objects.filter(
+            asset=self.tractor
+        ).order_by('date').as_arrays()
+        self.assertEqual(list(asset_ids), [self.tractor.pk, self.tractor.pk])
+        self.assertEqual(str(dates[-1]), "2024-02-29")
+        self.assertAlmostEqual(amounts.sum(), 1800.0)
+        self.assertAlmostEqual(book_values[-1], 118200.0)
+
+    def test_total_investment_is_cached_until_an_asset_changes(self):
+        cache.clear()
+        self.assertEqual(Asset.total_investment(), Decimal("180000.00"))
+        with self.assertNumQueries(0):
+            Asset.total_investment()
+        self.shed.delete()
+        self.assertEqual(Asset.total_investment(), Decimal("120000.00"))
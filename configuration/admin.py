@@ -25,7 +25,7 @@ class GlobalSettingsAdmin(admin.ModelAdmin):
 
     def has_add_permission(self, request):
         # Only allow one instance of GlobalSettings
-        return not GlobalSettings.objects.exists()
+        return GlobalSettings.get_solo() is None
 
 
 @admin.register(CustomFieldDefinition)
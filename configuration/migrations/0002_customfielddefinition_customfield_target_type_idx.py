@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2025-04-20 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configuration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customfielddefinition',
+            index=models.Index(fields=['target_model', 'field_type'], name='customfield_target_type_idx'),
+        ),
+    ]
@@ -1,4 +1,25 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+
+GLOBAL_SETTINGS_CACHE_KEY = 'configuration:global_settings'
+CUSTOM_FIELDS_CACHE_KEY = 'configuration:custom_fields:{}'
+# Invalidation only reaches other workers through a shared cache, so a per-process cache needs an expiry
+CONFIGURATION_CACHE_TIMEOUT = getattr(django_settings, 'CONFIGURATION_CACHE_TIMEOUT', 300)
+# Cleaned custom field value type -> converter to a JSON-storable value; other types are stored as-is
+_CUSTOM_VALUE_SERIALIZERS = {
+    date: date.isoformat,
+    datetime: datetime.isoformat,
+    Decimal: str,
+}
+# Distinguishes "nothing cached" from a cached None in cache.get()
+_NOT_CACHED = object()
 
 
 class GlobalSettings(models.Model):
@@ -41,6 +62,26 @@ class GlobalSettings(models.Model):
     def __str__(self):
         return f"{self.farm_name} Settings"
 
+    @cached_property
+    def milk_price_float(self):
+        """default_milk_price_per_litre as a float for charts and projections; keep the Decimal for money writes"""
+        return float(self.default_milk_price_per_litre)
+
+    @cached_property
+    def low_feed_threshold_kg_float(self):
+        """alert_low_feed_inventory_threshold_kg as a float for comparisons in inventory loops"""
+        return float(self.alert_low_feed_inventory_threshold_kg)
+
+    @classmethod
+    def get_solo(cls):
+        """Return the single settings row (or None), cached until it is next saved or deleted or the cache expires"""
+        # A missing row is cached as None too, so forms don't query on every init before setup
+        settings = cache.get(GLOBAL_SETTINGS_CACHE_KEY, _NOT_CACHED)
+        if settings is _NOT_CACHED:
+            settings = cls.objects.first()
+            cache.set(GLOBAL_SETTINGS_CACHE_KEY, settings, CONFIGURATION_CACHE_TIMEOUT)
+        return settings
+
     class Meta:
         verbose_name = "Global Settings"
         verbose_name_plural = "Global Settings"
@@ -48,19 +89,24 @@ class GlobalSettings(models.Model):
 
 class CustomFieldDefinition(models.Model):
     """Defines custom fields that can be added to specific modules"""
-    FIELD_TYPES = [
+    FIELD_TYPES = (
         ('TEXT', 'Text'),
         ('NUMBER', 'Number'),
         ('DATE', 'Date'),
         ('BOOLEAN', 'Boolean'),
-    ]
+    )
 
-    TARGET_MODELS = [
-        ('BUFFALO', 'Buffalo'),
-        ('EXPENSE', 'Expense'),
-        ('INCOME', 'Income'),
-        ('EMPLOYEE', 'Employee'),
-    ]
+    TARGET_BUFFALO = 'BUFFALO'
+    TARGET_EXPENSE = 'EXPENSE'
+    TARGET_INCOME = 'INCOME'
+    TARGET_EMPLOYEE = 'EMPLOYEE'
+
+    TARGET_MODELS = (
+        (TARGET_BUFFALO, 'Buffalo'),
+        (TARGET_EXPENSE, 'Expense'),
+        (TARGET_INCOME, 'Income'),
+        (TARGET_EMPLOYEE, 'Employee'),
+    )
 
     target_model = models.CharField(max_length=20, choices=TARGET_MODELS)
     field_name = models.CharField(max_length=50)
@@ -72,5 +118,48 @@ class CustomFieldDefinition(models.Model):
     def __str__(self):
         return f"{self.field_label} ({self.get_target_model_display()})"
 
+    @cached_property
+    def form_field_name(self):
+        """Name of the form field that edits this definition's value, e.g. 'custom_invoice_no'"""
+        return f"custom_{self.field_name}"
+
+    @classmethod
+    def for_target(cls, target_model):
+        """Return the definitions for a target model, cached until any definition changes"""
+        cache_key = CUSTOM_FIELDS_CACHE_KEY.format(target_model)
+        definitions = cache.get(cache_key)
+        if definitions is None:
+            # Only the columns forms build fields from (plus target_model for __str__) are loaded and cached
+            definitions = list(
+                cls.objects.filter(target_model=target_model)
+                .only('target_model', 'field_name', 'field_label', 'field_type', 'is_required')
+            )
+            cache.set(cache_key, definitions, CONFIGURATION_CACHE_TIMEOUT)
+        return definitions
+
+    @staticmethod
+    def serialize_value(value):
+        """Convert a cleaned custom field value into the form it is stored in a model's custom_data"""
+        serializer = _CUSTOM_VALUE_SERIALIZERS.get(type(value))
+        return serializer(value) if serializer else value
+
     class Meta:
-        unique_together = ('target_model', 'field_name')
\ No newline at end of file
+        unique_together = ('target_model', 'field_name')
+        indexes = [
+            # Backs the target_model/field_type filters on the API and the per-model form lookups
+            models.Index(fields=['target_model', 'field_type'], name='customfield_target_type_idx'),
+        ]
+
+
+@receiver([post_save, post_delete], sender=GlobalSettings)
+def clear_global_settings_cache(sender, instance, **kwargs):
+    """Drop the cached row on any save or delete, including admin bulk deletes that skip Model.delete()."""
+    cache.delete(GLOBAL_SETTINGS_CACHE_KEY)
+
+
+@receiver([post_save, post_delete], sender=CustomFieldDefinition)
+def clear_custom_fields_cache(sender, instance, **kwargs):
+    """Drop the cached definitions so forms pick up added, edited or deleted custom fields."""
+    cache.delete_many([
+        CUSTOM_FIELDS_CACHE_KEY.format(target) for target, _label in CustomFieldDefinition.TARGET_MODELS
+    ])
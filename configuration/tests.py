@@ -1,3 +1,69 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from .models import GlobalSettings, CustomFieldDefinition
+
+
+class GlobalSettingsCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.settings = GlobalSettings.objects.create(
+            farm_name="Test Farm",
+            start_date=date(2024, 1, 1),
+            default_milk_price_per_litre=Decimal("2.50")
+        )
+
+    def test_get_solo_is_cached(self):
+        self.assertEqual(GlobalSettings.get_solo().pk, self.settings.pk)
+        with self.assertNumQueries(0):
+            GlobalSettings.get_solo()
+
+    def test_save_invalidates_cache(self):
+        GlobalSettings.get_solo()
+        self.settings.default_milk_price_per_litre = Decimal("3.00")
+        self.settings.save()
+        self.assertEqual(GlobalSettings.get_solo().default_milk_price_per_litre, Decimal("3.00"))
+
+    def test_missing_row_is_cached_until_created(self):
+        GlobalSettings.objects.all().delete()
+        self.assertIsNone(GlobalSettings.get_solo())
+        with self.assertNumQueries(0):
+            self.assertIsNone(GlobalSettings.get_solo())
+        GlobalSettings.objects.create(farm_name="New Farm", start_date=date(2025, 1, 1),
+                                      default_milk_price_per_litre=Decimal("2.00"))
+        self.assertEqual(GlobalSettings.get_solo().farm_name, "New Farm")
+
+    def test_float_defaults_match_decimal_fields(self):
+        settings = GlobalSettings.get_solo()
+        self.assertEqual(settings.milk_price_float, float(settings.default_milk_price_per_litre))
+        self.assertIsInstance(settings.low_feed_threshold_kg_float, float)
+
+
+class CustomFieldDefinitionCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_for_target_is_cached_and_invalidated(self):
+        CustomFieldDefinition.objects.create(
+            target_model='EXPENSE', field_name='invoice_no', field_label='Invoice No', field_type='TEXT'
+        )
+        self.assertEqual([cf.field_name for cf in CustomFieldDefinition.for_target('EXPENSE')], ['invoice_no'])
+        with self.assertNumQueries(0):
+            definition, = CustomFieldDefinition.for_target('EXPENSE')
+            # The columns forms read are loaded, not deferred
+            self.assertEqual((definition.field_label, definition.field_type, definition.is_required),
+                             ('Invoice No', 'TEXT', False))
+            self.assertEqual(definition.form_field_name, 'custom_invoice_no')
+
+        CustomFieldDefinition.objects.create(
+            target_model='EXPENSE', field_name='batch', field_label='Batch', field_type='TEXT'
+        )
+        self.assertEqual(len(CustomFieldDefinition.for_target('EXPENSE')), 2)
+
+    def test_serialize_value_converts_dates_and_decimals(self):
+        self.assertEqual(CustomFieldDefinition.serialize_value(date(2025, 3, 30)), '2025-03-30')
+        self.assertEqual(CustomFieldDefinition.serialize_value(Decimal('12.50')), '12.50')
+        self.assertEqual(CustomFieldDefinition.serialize_value(True), True)
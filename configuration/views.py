@@ -1,21 +1,38 @@
+import re
+from functools import wraps
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.views import redirect_to_login
+from django.db import IntegrityError, transaction
 from rest_framework import viewsets
 from rest_framework.permissions import IsAdminUser
 from .models import GlobalSettings, CustomFieldDefinition
 from .serializers import GlobalSettingsSerializer, CustomFieldDefinitionSerializer
 
+# Custom field names become form field and JSON keys: an identifier made of letters, digits and underscores
+_FIELD_NAME_RE = re.compile(r'\A[A-Za-z_][A-Za-z0-9_]*\Z')
+
 
 def is_admin(user):
     return user.is_superuser or user.is_staff
 
 
-@login_required
-@user_passes_test(is_admin)
+def admin_required(view_func):
+    """Allow only authenticated staff/superusers; send everyone else to the login page"""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        user = request.user
+        if user.is_authenticated and is_admin(user):
+            return view_func(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path())
+    return _wrapped_view
+
+
+@admin_required
 def settings_view(request):
     """View for managing global settings"""
-    settings = GlobalSettings.objects.first()
+    settings = GlobalSettings.get_solo()
 
     if request.method == 'POST':
         # Simple form validation and saving
@@ -48,8 +65,7 @@ def settings_view(request):
     return render(request, 'dairy_erp/configuration/settings.html', context)
 
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def custom_fields_view(request):
     """View for managing custom fields"""
     custom_fields = CustomFieldDefinition.objects.all().order_by('target_model', 'field_label')
@@ -61,8 +77,7 @@ def custom_fields_view(request):
     return render(request, 'dairy_erp/configuration/custom_fields.html', context)
 
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def add_custom_field(request):
     """View for adding a new custom field"""
     if request.method == 'POST':
@@ -74,22 +89,22 @@ def add_custom_field(request):
             is_required = request.POST.get('is_required') == 'on'
 
             # Validate field_name format (no spaces, only alphanumeric and underscore)
-            if not field_name.isalnum() and '_' not in field_name:
+            if not _FIELD_NAME_RE.match(field_name or ''):
                 raise ValueError("Field name must contain only letters, numbers, and underscores")
 
-            # Check for duplicates
-            if CustomFieldDefinition.objects.filter(target_model=target_model, field_name=field_name).exists():
+            # Duplicates are rejected by the (target_model, field_name) unique constraint on insert
+            try:
+                with transaction.atomic():
+                    CustomFieldDefinition.objects.create(
+                        target_model=target_model,
+                        field_name=field_name,
+                        field_label=field_label,
+                        field_type=field_type,
+                        is_required=is_required
+                    )
+            except IntegrityError:
                 raise ValueError("A field with this name already exists for the selected model")
 
-            custom_field = CustomFieldDefinition(
-                target_model=target_model,
-                field_name=field_name,
-                field_label=field_label,
-                field_type=field_type,
-                is_required=is_required
-            )
-            custom_field.save()
-
             messages.success(request, 'Custom field added successfully!')
             return redirect('configuration:custom_fields')
         except Exception as e:
@@ -103,8 +118,7 @@ def add_custom_field(request):
     return render(request, 'dairy_erp/configuration/add_custom_field.html', context)
 
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def edit_custom_field(request, field_id):
     """View for editing an existing custom field"""
     custom_field = get_object_or_404(CustomFieldDefinition, id=field_id)
@@ -130,8 +144,7 @@ def edit_custom_field(request, field_id):
     return render(request, 'dairy_erp/configuration/edit_custom_field.html', context)
 
 
-@login_required
-@user_passes_test(is_admin)
+@admin_required
 def delete_custom_field(request, field_id):
     """View for deleting a custom field"""
     custom_field = get_object_or_404(CustomFieldDefinition, id=field_id)
@@ -152,10 +165,15 @@ class GlobalSettingsViewSet(viewsets.ModelViewSet):
     queryset = GlobalSettings.objects.all()
     serializer_class = GlobalSettingsSerializer
     permission_classes = [IsAdminUser]
+    # There is at most one row, so skip the pagination COUNT query
+    pagination_class = None
 
     def get_queryset(self):
-        # Only return the first (and only) settings object
-        return GlobalSettings.objects.all()[:1]
+        # Only return the first (and only) settings object, looked up by primary key
+        settings = GlobalSettings.get_solo()
+        if settings is None:
+            return GlobalSettings.objects.none()
+        return GlobalSettings.objects.filter(pk=settings.pk)
 
 
 class CustomFieldDefinitionViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,121 @@
+import functools
+
+from django import forms
+from django.db import transaction
+
+from configuration.models import CustomFieldDefinition
+
+# Widgets copy the attrs they are given, so these dicts can be shared safely.
+_FIELD_ATTRS = {'class': 'form-control'}
+_DATE_ATTRS = {'class': 'form-control', 'type': 'date'}
+_CHECK_ATTRS = {'class': 'form-check-input'}
+
+# Maps a CustomFieldDefinition.field_type to a callable building the matching form field.
+CUSTOM_FIELD_FACTORY = {
+    'TEXT': lambda **kwargs: forms.CharField(widget=forms.TextInput(attrs=_FIELD_ATTRS), **kwargs),
+    'NUMBER': lambda **kwargs: forms.DecimalField(widget=forms.NumberInput(attrs=_FIELD_ATTRS), **kwargs),
+    'DATE': lambda **kwargs: forms.DateField(widget=forms.DateInput(attrs=_DATE_ATTRS), **kwargs),
+    'BOOLEAN': lambda **kwargs: forms.BooleanField(widget=forms.CheckboxInput(attrs=_CHECK_ATTRS), **kwargs),
+}
+
+
+class BootstrapFormMixin:
+    """
+    Adds Bootstrap classes to every declared field widget.
+    The class is chosen by widget type and written onto the form class's base_fields the first time
+    the form is built, so later instances inherit it through Django's per-instance field copy.
+    Widgets that already carry a class keep it.
+    """
+    WIDGET_CSS_CLASSES = {
+        forms.CheckboxInput: 'form-check-input',
+    }
+    DEFAULT_CSS_CLASS = 'form-control'
+
+    def __init__(self, *args, **kwargs):
+        form_class = type(self)
+        if not form_class.__dict__.get('_bootstrap_styled'):
+            for field in form_class.base_fields.values():
+                css_class = self.WIDGET_CSS_CLASSES.get(type(field.widget), self.DEFAULT_CSS_CLASS)
+                field.widget.attrs.setdefault('class', css_class)
+            form_class._bootstrap_styled = True
+        super().__init__(*args, **kwargs)
+
+
+class CustomFieldFormMixin:
+    """
+    Stores the values of custom fields in the instance's custom_data.
+    The fields themselves are declared on a subclass built by for_custom_fields(), which is cached
+    per set of definitions so they are constructed once rather than on every form instantiation.
+    """
+    # CustomFieldDefinition.TARGET_* value whose definitions this form picks up
+    custom_field_target = None
+    # Form field name -> custom_data key, filled in on the classes built by for_custom_fields()
+    custom_field_names = {}
+
+    @classmethod
+    def for_custom_fields(cls):
+        """Return this form class extended with the currently defined custom fields, or itself when there are none."""
+        definitions = CustomFieldDefinition.for_target(cls.custom_field_target)
+        if not definitions:
+            return cls
+        signature = tuple(
+            (cf.form_field_name, cf.field_name, cf.field_label, cf.field_type, cf.is_required) for cf in definitions
+        )
+        return _build_custom_field_form(cls, signature)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Pre-fill custom fields with the values already stored on the instance.
+        if self.custom_field_names and self.instance.pk:
+            for field_name, key in self.custom_field_names.items():
+                if key in self.instance.custom_data:
+                    self.initial.setdefault(field_name, self.instance.custom_data[key])
+
+    def save(self, commit=True):
+        # Save the standard fields first.
+        instance = super().save(commit=False)
+        # Without custom fields there is nothing to merge, so custom_data is left as loaded.
+        if self.custom_field_names:
+            # Ensure custom_data is a dictionary.
+            if not instance.custom_data:
+                instance.custom_data = {}
+            # Update the instance's custom_data with the custom field values.
+            for field_name, key in self.custom_field_names.items():
+                if field_name in self.cleaned_data:
+                    # Dates are stored in ISO format and decimals as strings.
+                    instance.custom_data[key] = CustomFieldDefinition.serialize_value(self.cleaned_data[field_name])
+        if commit:
+            with transaction.atomic():
+                instance.save(update_fields=self._changed_model_fields(instance))
+                self.save_m2m()
+        return instance
+
+    def _changed_model_fields(self, instance):
+        """
+        Return the model fields an edit needs to write, or None to save every column of a new instance.
+        That is the changed form fields, custom_data when a custom field changed, and any auto_now timestamps.
+        """
+        if instance._state.adding:
+            return None
+        concrete_fields = instance._meta.concrete_fields
+        model_field_names = {field.name for field in concrete_fields}
+        update_fields = [name for name in self.changed_data if name in model_field_names]
+        if any(name in self.custom_field_names for name in self.changed_data):
+            update_fields.append('custom_data')
+        update_fields.extend(field.name for field in concrete_fields if getattr(field, 'auto_now', False))
+        return update_fields
+
+
+@functools.lru_cache(maxsize=32)
+def _build_custom_field_form(form_class, signature):
+    """
+    Declare one field per (form_field_name, field_name, label, field_type, is_required) entry on a subclass
+    of form_class.
+    """
+    attrs = {'__module__': form_class.__module__, 'custom_field_names': {}}
+    for form_field_name, field_name, label, field_type, required in signature:
+        factory = CUSTOM_FIELD_FACTORY.get(field_type)
+        if factory:
+            attrs[form_field_name] = factory(label=label, required=required)
+            attrs['custom_field_names'][form_field_name] = field_name
+    return type(form_class)(form_class.__name__, (form_class,), attrs)
@@ -0,0 +1,19 @@
+"""
+core/signals.py
+
+Clears the cached dashboard figures when the herd or milk records they are computed from change.
+"""
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from herd.models import Buffalo, MilkProduction
+from .views import DASHBOARD_CACHE_KEY
+
+
+@receiver([post_save, post_delete], sender=Buffalo)
+@receiver([post_save, post_delete], sender=MilkProduction)
+def clear_dashboard_cache(sender, **kwargs):
+    """Drop the cached dashboard so the next load recomputes herd counts and milk totals."""
+    cache.delete(DASHBOARD_CACHE_KEY)
@@ -2,35 +2,67 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+
+
+DASHBOARD_CACHE_KEY = 'core:dashboard'
+DASHBOARD_CACHE_TIMEOUT = 60
 
 
 @login_required
 def dashboard(request):
     """Main dashboard view"""
+    # The figures are farm-wide, so every user shares one cached copy; herd and milk writes clear it
+    context = cache.get(DASHBOARD_CACHE_KEY)
+    if context is None:
+        context = _build_dashboard_context()
+        cache.set(DASHBOARD_CACHE_KEY, context, DASHBOARD_CACHE_TIMEOUT)
+    return render(request, 'dairy_erp/dashboard.html', context)
+
+
+def _build_dashboard_context():
+    """Compute the herd summary and last-7-days milk figures shown on the dashboard"""
     # Import module models inside the function to avoid circular imports
     from herd.models import Buffalo, MilkProduction
-    from django.db.models import Sum, Avg
+    from django.db.models import CharField, Sum, Count, Q
+    from django.db.models.functions import Cast
     import datetime
     from django.utils import timezone
 
-    # Get herd summary data
-    total_buffalo = Buffalo.objects.filter(is_active=True).count()
-    milking_buffalo = Buffalo.objects.filter(is_active=True, status='MILKING').count()
-    dry_buffalo = Buffalo.objects.filter(is_active=True, status='DRY').count()
-    pregnant_buffalo = Buffalo.objects.filter(is_active=True, status='PREGNANT').count()
+    # Get herd summary data in a single aggregate query
+    herd_counts = Buffalo.objects.active().aggregate(
+        total=Count('pk'),
+        milking=Count('pk', filter=Q(status=Buffalo.STATUS_MILKING)),
+        dry=Count('pk', filter=Q(status=Buffalo.STATUS_DRY)),
+        pregnant=Count('pk', filter=Q(status=Buffalo.STATUS_PREGNANT)),
+    )
+    total_buffalo = herd_counts['total']
+    milking_buffalo = herd_counts['milking']
+    dry_buffalo = herd_counts['dry']
+    pregnant_buffalo = herd_counts['pregnant']
 
     # Get milk production data for the last 7 days
     seven_days_ago = timezone.now().date() - datetime.timedelta(days=7)
     milk_production = MilkProduction.objects.filter(date__gte=seven_days_ago)
 
-    # Calculate daily milk production for the chart
-    daily_milk = milk_production.values('date').annotate(total=Sum('quantity_litres')).order_by('date')
-
-    milk_dates = [entry['date'].strftime('%Y-%m-%d') for entry in daily_milk]
-    milk_values = [float(entry['total']) for entry in daily_milk]
-
-    # Calculate total and average milk production
-    total_milk = milk_production.aggregate(total=Sum('quantity_litres'))['total'] or 0
+    # Calculate daily milk production for the chart; the database renders each date as a YYYY-MM-DD label
+    daily_milk = (
+        milk_production.annotate(day=Cast('date', output_field=CharField()))
+        .values('day')
+        .annotate(total=Sum('quantity_litres'))
+        .order_by('day')
+    )
+
+    # Build the chart series and the overall total from the grouped rows in one pass
+    milk_dates = []
+    milk_values = []
+    total_milk = 0
+    for entry in daily_milk:
+        milk_dates.append(entry['day'])
+        milk_values.append(float(entry['total']))
+        total_milk += entry['total']
+
+    # Calculate average milk production
     avg_milk_per_day = 0
     if milk_dates:
         avg_milk_per_day = total_milk / len(milk_dates)
@@ -38,7 +70,7 @@ def dashboard(request):
     # Compute the remaining buffalo count
     remaining_buffalo = total_buffalo - milking_buffalo - dry_buffalo - pregnant_buffalo
 
-    context = {
+    return {
         'title': 'Dashboard',
         'total_buffalo': total_buffalo,
         'milking_buffalo': milking_buffalo,
@@ -51,7 +83,6 @@ def dashboard(request):
         'remaining_buffalo': remaining_buffalo,
 
     }
-    return render(request, 'dairy_erp/dashboard.html', context)
 
 
 def login_view(request):
@@ -0,0 +1,20 @@
+"""
+Celery application for the dairy_erp project.
+
+Start a worker for scheduled report work with:
+    celery -A dairy_erp worker -Q reports --concurrency=2
+and the scheduler with:
+    celery -A dairy_erp beat
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dairy_erp.settings')
+
+app = Celery('dairy_erp')
+# Read CELERY_* settings from the Django settings module.
+app.config_from_object('django.conf:settings', namespace='CELERY')
+# Pick up tasks.py modules from the installed apps.
+app.autodiscover_tasks()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from celery.schedules import crontab
 
@@ -107,10 +108,41 @@ DATABASES = {
         'PASSWORD': 'aariusz',  # the password you set during PostgreSQL installation
         'HOST': 'localhost',
         'PORT': '5432',
+        # Reuse connections across requests instead of reconnecting per view
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Cached singletons such as GlobalSettings are shared by every worker when REDIS_URL is set;
+# without it each process keeps its own local-memory copy.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'dairy_erp',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Cached configuration rows are invalidated on save; keep them indefinitely only when that reaches every worker
+CONFIGURATION_CACHE_TIMEOUT = None if REDIS_URL else 300
+# Same for the cached asset total behind ROI, which the Celery worker reads when it writes Profitability rows
+ASSETS_CACHE_TIMEOUT = None if REDIS_URL else 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -172,6 +204,12 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL or 'redis://localhost:6379/0')
+# Report generation runs on its own queue so it never starves user-facing work.
+CELERY_TASK_ROUTES = {
+    'finance.tasks.*': {'queue': 'reports'},
+}
+
 CELERY_BEAT_SCHEDULE = {
     'run-monthly-profitability': {
         'task': 'finance.tasks.run_monthly_profitability_task',
@@ -7,8 +7,25 @@ filters, search fields, and autocomplete for related models.
 """
 
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from .models import ExpenseCategory, IncomeCategory, ExpenseRecord, IncomeRecord, Profitability
 
+
+class ListDisplayOnlyChangeList(ChangeList):
+    """
+    Change list that loads only the columns named in list_display.
+    Applied here rather than in ModelAdmin.get_queryset so the edit and delete views still fetch full rows.
+    """
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        return queryset.only(*self.model_admin.list_display)
+
+
+class ListDisplayOnlyMixin:
+    """Admin mixin that swaps in ListDisplayOnlyChangeList; list_display must contain only model fields."""
+    def get_changelist(self, request, **kwargs):
+        return ListDisplayOnlyChangeList
+
 @admin.register(ExpenseCategory)
 class ExpenseCategoryAdmin(admin.ModelAdmin):
     """
@@ -32,7 +49,7 @@ class IncomeCategoryAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 @admin.register(ExpenseRecord)
-class ExpenseRecordAdmin(admin.ModelAdmin):
+class ExpenseRecordAdmin(ListDisplayOnlyMixin, admin.ModelAdmin):
     """
     Custom admin interface for ExpenseRecord.
     - list_display: Displays key fields (date, category, description, amount, etc.).
@@ -40,15 +57,18 @@ class ExpenseRecordAdmin(admin.ModelAdmin):
     - search_fields: Allows searching by description and supplier/vendor.
     - date_hierarchy: Provides navigation by date.
     - autocomplete_fields: Uses an autocomplete widget for the 'related_buffalo' field.
+    - list_select_related: Joins category and the nullable related_buffalo so the change list avoids per-row queries.
+    - ListDisplayOnlyMixin: Skips notes and custom_data, which the change list never renders.
     """
     list_display = ('date', 'category', 'description', 'amount', 'supplier_vendor', 'related_buffalo')
+    list_select_related = ('category', 'related_buffalo')
     list_filter = ('category', 'date')
     search_fields = ('description', 'supplier_vendor')
     date_hierarchy = 'date'
     autocomplete_fields = ['related_buffalo']
 
 @admin.register(IncomeRecord)
-class IncomeRecordAdmin(admin.ModelAdmin):
+class IncomeRecordAdmin(ListDisplayOnlyMixin, admin.ModelAdmin):
     """
     Custom admin interface for IncomeRecord.
     - list_display: Shows important income record fields including amounts and linked buffalo.
@@ -56,8 +76,11 @@ class IncomeRecordAdmin(admin.ModelAdmin):
     - search_fields: Enables search on description and customer fields.
     - date_hierarchy: Provides navigation based on date.
     - autocomplete_fields: Uses autocomplete for the 'related_buffalo' field.
+    - list_select_related: Joins category and the nullable related_buffalo so the change list avoids per-row queries.
+    - ListDisplayOnlyMixin: Skips notes and custom_data, which the change list never renders.
     """
     list_display = ('date', 'category', 'description', 'quantity', 'unit_price', 'total_amount', 'customer', 'related_buffalo')
+    list_select_related = ('category', 'related_buffalo')
     list_filter = ('category', 'date')
     search_fields = ('description', 'customer')
     date_hierarchy = 'date'
@@ -9,12 +9,12 @@ how custom fields are dynamically added based on definitions, and how calculatio
 from django import forms
 from .models import ExpenseRecord, IncomeRecord, ExpenseCategory, IncomeCategory
 from configuration.models import CustomFieldDefinition, GlobalSettings
-from herd.models import Buffalo
-from datetime import date, datetime
+from core.forms import BootstrapFormMixin, CustomFieldFormMixin
+from herd.forms import ActiveBuffaloChoiceField
 
 
 # ---------------- Expense Category Form ----------------
-class ExpenseCategoryForm(forms.ModelForm):
+class ExpenseCategoryForm(BootstrapFormMixin, forms.ModelForm):
     """
     Form for creating/editing an ExpenseCategory.
     Applies Bootstrap classes to enhance the UI.
@@ -24,18 +24,9 @@ class ExpenseCategoryForm(forms.ModelForm):
         model = ExpenseCategory
         fields = ['name', 'description', 'is_direct_cost']
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Add Bootstrap classes to each field widget.
-        for field in self.fields:
-            if field == 'is_direct_cost':
-                self.fields[field].widget.attrs.update({'class': 'form-check-input'})
-            else:
-                self.fields[field].widget.attrs.update({'class': 'form-control'})
-
 
 # ---------------- Income Category Form ----------------
-class IncomeCategoryForm(forms.ModelForm):
+class IncomeCategoryForm(BootstrapFormMixin, forms.ModelForm):
     """
     Form for creating/editing an IncomeCategory.
     """
@@ -44,19 +35,14 @@ class IncomeCategoryForm(forms.ModelForm):
         model = IncomeCategory
         fields = ['name', 'description']
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Add Bootstrap styling to all fields.
-        for field in self.fields:
-            self.fields[field].widget.attrs.update({'class': 'form-control'})
-
 
 # ---------------- Expense Record Form ----------------
-class ExpenseRecordForm(forms.ModelForm):
+class ExpenseRecordForm(CustomFieldFormMixin, BootstrapFormMixin, forms.ModelForm):
     """
     Form for creating/editing an ExpenseRecord.
-    Dynamically adds any custom fields defined for the "EXPENSE" target model.
+    ExpenseRecordForm.for_custom_fields() adds any custom fields defined for the "EXPENSE" target model.
     """
+    custom_field_target = CustomFieldDefinition.TARGET_EXPENSE
 
     class Meta:
         model = ExpenseRecord
@@ -65,81 +51,20 @@ class ExpenseRecordForm(forms.ModelForm):
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
         }
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Add Bootstrap class to each widget.
-        for field in self.fields:
-            self.fields[field].widget.attrs.update({'class': 'form-control'})
-        # Limit the related_buffalo queryset to only active buffaloes.
-        self.fields['related_buffalo'].queryset = Buffalo.objects.filter(is_active=True)
-
-        # Dynamically add custom fields based on the CustomFieldDefinition for expenses.
-        custom_fields = CustomFieldDefinition.objects.filter(target_model='EXPENSE')
-        for cf in custom_fields:
-            field_name = f"custom_{cf.field_name}"
-            # Check if editing an instance that already has a stored value.
-            initial_value = None
-            if self.instance.pk and cf.field_name in self.instance.custom_data:
-                initial_value = self.instance.custom_data.get(cf.field_name)
-            # Depending on the field type, create the proper form field.
-            if cf.field_type == 'TEXT':
-                self.fields[field_name] = forms.CharField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.TextInput(attrs={'class': 'form-control'})
-                )
-            elif cf.field_type == 'NUMBER':
-                self.fields[field_name] = forms.DecimalField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.NumberInput(attrs={'class': 'form-control'})
-                )
-            elif cf.field_type == 'DATE':
-                self.fields[field_name] = forms.DateField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
-                )
-            elif cf.field_type == 'BOOLEAN':
-                self.fields[field_name] = forms.BooleanField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
-                )
-
-    def save(self, commit=True):
-        # Save the standard fields first.
-        instance = super().save(commit=False)
-        # Ensure custom_data is a dictionary.
-        if not instance.custom_data:
-            instance.custom_data = {}
-        # Update the instance's custom_data with the custom field values.
-        custom_fields = CustomFieldDefinition.objects.filter(target_model='EXPENSE')
-        for cf in custom_fields:
-            field_name = f"custom_{cf.field_name}"
-            if field_name in self.cleaned_data:
-                value = self.cleaned_data[field_name]
-                # If the value is a date/datetime, store it in ISO format.
-                if isinstance(value, (datetime, date)):
-                    value = value.isoformat()
-                instance.custom_data[cf.field_name] = value
-        if commit:
-            instance.save()
-        return instance
+        # Limit the related_buffalo choices to only active buffaloes.
+        field_classes = {
+            'related_buffalo': ActiveBuffaloChoiceField,
+        }
 
 
 # ---------------- Income Record Form ----------------
-class IncomeRecordForm(forms.ModelForm):
+class IncomeRecordForm(CustomFieldFormMixin, BootstrapFormMixin, forms.ModelForm):
     """
     Form for creating/editing an IncomeRecord.
-    Also dynamically adds custom fields defined for the "INCOME" target model.
+    IncomeRecordForm.for_custom_fields() adds any custom fields defined for the "INCOME" target model.
     Auto-calculates total_amount if not provided.
     """
+    custom_field_target = CustomFieldDefinition.TARGET_INCOME
 
     class Meta:
         model = IncomeRecord
@@ -148,88 +73,29 @@ class IncomeRecordForm(forms.ModelForm):
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
         }
+        # Limit the dropdown to only active buffaloes.
+        field_classes = {
+            'related_buffalo': ActiveBuffaloChoiceField,
+        }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Apply Bootstrap styling to each field.
-        for field in self.fields:
-            self.fields[field].widget.attrs.update({'class': 'form-control'})
-        # Limit the dropdown to only active buffaloes.
-        self.fields['related_buffalo'].queryset = Buffalo.objects.filter(is_active=True)
         # Set default milk price from GlobalSettings if creating a new record.
-        settings = GlobalSettings.objects.first()
+        settings = GlobalSettings.get_solo()
         if settings and not self.instance.pk:
             self.fields['unit_price'].initial = settings.default_milk_price_per_litre
-        # Add any custom fields defined for income.
-        custom_fields = CustomFieldDefinition.objects.filter(target_model='INCOME')
-        for cf in custom_fields:
-            field_name = f"custom_{cf.field_name}"
-            initial_value = None
-            if self.instance.pk and cf.field_name in self.instance.custom_data:
-                initial_value = self.instance.custom_data.get(cf.field_name)
-            if cf.field_type == 'TEXT':
-                self.fields[field_name] = forms.CharField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.TextInput(attrs={'class': 'form-control'})
-                )
-            elif cf.field_type == 'NUMBER':
-                self.fields[field_name] = forms.DecimalField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.NumberInput(attrs={'class': 'form-control'})
-                )
-            elif cf.field_type == 'DATE':
-                self.fields[field_name] = forms.DateField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
-                )
-            elif cf.field_type == 'BOOLEAN':
-                self.fields[field_name] = forms.BooleanField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
-                )
 
     def clean(self):
         cleaned_data = super().clean()
-        quantity = cleaned_data.get('quantity')
-        unit_price = cleaned_data.get('unit_price')
-        total_amount = cleaned_data.get('total_amount')
-        # If both quantity and unit_price are provided, calculate total_amount if it is empty or zero.
-        if quantity and unit_price and (not total_amount or total_amount == 0):
-            cleaned_data['total_amount'] = quantity * unit_price
-        # If total_amount is absent and either quantity or unit_price is missing, raise an error.
-        if not total_amount and (not quantity or not unit_price):
+        # Calculate total_amount from quantity and unit_price if it is empty or zero.
+        cleaned_data['total_amount'] = IncomeRecord.resolve_total_amount(
+            cleaned_data.get('quantity'), cleaned_data.get('unit_price'), cleaned_data.get('total_amount')
+        )
+        # If total_amount is still absent, either quantity or unit_price was missing.
+        if not cleaned_data['total_amount']:
             self.add_error('total_amount', 'Please provide either Total Amount or both Quantity and Unit Price')
         return cleaned_data
 
-    def save(self, commit=True):
-        # Save standard fields.
-        instance = super().save(commit=False)
-        if self.cleaned_data.get('quantity') and self.cleaned_data.get('unit_price') and (
-        not self.cleaned_data.get('total_amount')):
-            instance.total_amount = self.cleaned_data['quantity'] * self.cleaned_data['unit_price']
-        if not instance.custom_data:
-            instance.custom_data = {}
-        # Save custom field values into the instance's custom_data dictionary.
-        custom_fields = CustomFieldDefinition.objects.filter(target_model='INCOME')
-        for cf in custom_fields:
-            field_name = f"custom_{cf.field_name}"
-            if field_name in self.cleaned_data:
-                value = self.cleaned_data[field_name]
-                if isinstance(value, (datetime, date)):
-                    value = value.isoformat()
-                instance.custom_data[cf.field_name] = value
-        if commit:
-            instance.save()
-        return instance
-
 
 # ---------------- Milk Income Generator Form ----------------
 class MilkIncomeGeneratorForm(forms.Form):
@@ -253,6 +119,6 @@ class MilkIncomeGeneratorForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Set the default milk price based on GlobalSettings.
-        settings = GlobalSettings.objects.first()
+        settings = GlobalSettings.get_solo()
         if settings:
             self.fields['milk_price'].initial = settings.default_milk_price_per_litre
@@ -6,12 +6,21 @@ It includes models to record expenses, income, loans, loan payments, and profita
 Each model includes detailed inline comments explaining fields, formulas, dependencies, and business rules.
 """
 
-from django.db import models
+import functools
+import logging
+
+from django.db import DatabaseError, models, transaction
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Sum, F
+from django.db.models import Sum, F, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from decimal import Decimal
+import numpy as np
+from dateutil.relativedelta import relativedelta
 from herd.models import Buffalo  # Buffalo model from the herd app
 
+logger = logging.getLogger(__name__)
+
+
 # ------------------- Expense Category -------------------
 class ExpenseCategory(models.Model):
     """
@@ -65,27 +74,135 @@ class ExpenseRecord(models.Model):
     )
     supplier_vendor = models.CharField(_('Supplier/Vendor'), max_length=100, blank=True)
     notes = models.TextField(_('Notes'), blank=True)
+    # Values of the custom fields defined for expenses, keyed by field_name
+    custom_data = models.JSONField(_('Custom Data'), default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.date} - {self.category}: {self.amount}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was stored so save() can apply only the change to the buffalo's cumulative cost
+        instance._remember_buffalo_cost()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # The reloaded values are what is stored now, so deltas must be taken against them
+        if fields is None or not {'amount', 'related_buffalo', 'related_buffalo_id'}.isdisjoint(fields):
+            self._remember_buffalo_cost()
+
+    def _remember_buffalo_cost(self):
+        # Deferred fields are skipped; save() then falls back to a full recompute
+        loaded = self.__dict__
+        if 'amount' in loaded and 'related_buffalo_id' in loaded:
+            self._loaded_buffalo_cost = (self.related_buffalo_id, self._amount_as_decimal())
+
+    def _amount_as_decimal(self):
+        # Callers sometimes pass floats or ints; Decimal arithmetic below needs a Decimal
+        return self._meta.get_field('amount').to_python(self.amount)
+
     def save(self, *args, **kwargs):
-        # Save the ExpenseRecord normally
-        super().save(*args, **kwargs)
-        # If this expense is related to a buffalo, recalculate the buffalo's cumulative cost
-        if self.related_buffalo:
-            total_cost = ExpenseRecord.objects.filter(
-                related_buffalo=self.related_buffalo
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            self.related_buffalo.cumulative_cost = total_cost
-            self.related_buffalo.save(update_fields=['cumulative_cost'])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'amount', 'related_buffalo', 'related_buffalo_id'}.isdisjoint(update_fields):
+            # Neither the amount nor the buffalo is written, so the buffalo's cost (and what was loaded) stays as is
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            # Save the ExpenseRecord normally
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            if adding:
+                self._apply_buffalo_cost_delta(None, Decimal('0.00'))
+            elif hasattr(self, '_loaded_buffalo_cost'):
+                self._apply_buffalo_cost_delta(*self._loaded_buffalo_cost)
+            elif self.related_buffalo_id:
+                # The stored values are unknown, so reconcile the buffalo's total from scratch
+                self.recalculate_buffalo_cost(self.related_buffalo_id)
+        self._remember_buffalo_cost()
+
+    def _apply_buffalo_cost_delta(self, old_buffalo_id, old_amount):
+        """Move this expense's contribution from the stored buffalo/amount to the current ones."""
+        new_amount = self._amount_as_decimal() if self.related_buffalo_id else Decimal('0.00')
+        if old_buffalo_id == self.related_buffalo_id:
+            adjustments = {old_buffalo_id: new_amount - old_amount}
+        else:
+            adjustments = {old_buffalo_id: -old_amount, self.related_buffalo_id: new_amount}
+        for buffalo_id, delta in adjustments.items():
+            if buffalo_id and delta:
+                Buffalo.objects.filter(pk=buffalo_id).update(cumulative_cost=F('cumulative_cost') + delta)
+                # Keep an already-loaded related buffalo in step with the row
+                if buffalo_id == self.related_buffalo_id and self.__class__.related_buffalo.is_cached(self):
+                    self.related_buffalo.cumulative_cost += delta
+
+    @classmethod
+    def bulk_create_with_buffalo_totals(cls, records, batch_size=500):
+        """
+        Insert many expenses at once and add their amounts to each related buffalo's cumulative cost.
+        bulk_create() skips save(), so the totals are applied here as one UPDATE per distinct buffalo.
+        """
+        with transaction.atomic():
+            created = cls.objects.bulk_create(records, batch_size=batch_size)
+            totals = {}
+            for record in created:
+                if record.related_buffalo_id:
+                    totals[record.related_buffalo_id] = (
+                        totals.get(record.related_buffalo_id, Decimal('0.00')) + record._amount_as_decimal()
+                    )
+            for buffalo_id, total in totals.items():
+                Buffalo.objects.filter(pk=buffalo_id).update(cumulative_cost=F('cumulative_cost') + total)
+        for record in created:
+            record._remember_buffalo_cost()
+        return created
+
+    @staticmethod
+    def recalculate_buffalo_cost(buffalo_id):
+        """Reset a buffalo's cumulative cost to the sum of its expense records."""
+        ExpenseRecord.recalculate_buffalo_costs([buffalo_id])
+
+    @staticmethod
+    def recalculate_buffalo_costs(buffalo_ids=None):
+        """
+        Reset the cumulative cost of the given buffaloes (all of them when None) to the sum of their expense
+        records, in a single UPDATE with a correlated subquery.
+        Use it after rows were written without save(), e.g. by loaddata or raw SQL imports.
+        Returns the number of buffaloes updated.
+        """
+        totals = (
+            ExpenseRecord.objects.filter(related_buffalo=OuterRef('pk'))
+            .order_by()
+            .values('related_buffalo')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        buffaloes = Buffalo.objects.all() if buffalo_ids is None else Buffalo.objects.filter(pk__in=buffalo_ids)
+        return buffaloes.update(cumulative_cost=Coalesce(
+            Subquery(totals, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0.00')),
+        ))
 
     class Meta:
         verbose_name = _('Expense Record')
         verbose_name_plural = _('Expense Records')
         ordering = ['-date']
+        indexes = [
+            # Backs date-range reports and the admin's category/date filters
+            models.Index(fields=['date', 'category'], name='expense_date_category_idx'),
+            # Lets recalculate_buffalo_cost() sum a buffalo's amounts from the index alone
+            models.Index(fields=['related_buffalo', 'amount'], name='expense_buffalo_amount_idx'),
+            # Serves the expense list's category filter with its date range and -date ordering
+            models.Index(fields=['category', 'date'], name='expense_category_date_idx'),
+        ]
+        constraints = [
+            # A loan payment has at most one interest expense
+            models.UniqueConstraint(
+                fields=['related_module', 'related_record_id'], condition=Q(related_module='LoanPayment'),
+                name='uniq_loanpayment_expense'
+            ),
+        ]
 
 
 # ------------------- Income Category -------------------
@@ -109,6 +226,21 @@ class IncomeCategory(models.Model):
 
 
 # ------------------- Income Record -------------------
+class IncomeRecordQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        bulk_create() doesn't call save(); fill in each record's missing total_amount the same way save() would,
+        so bulk imports can leave it empty and still get one multi-row INSERT.
+        """
+        objs = list(objs)
+        for obj in objs:
+            obj.total_amount = self.model.resolve_total_amount(obj.quantity, obj.unit_price, obj.total_amount)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+IncomeRecordManager = models.Manager.from_queryset(IncomeRecordQuerySet)
+
+
 class IncomeRecord(models.Model):
     """
     Model for tracking all farm income records.
@@ -134,25 +266,97 @@ class IncomeRecord(models.Model):
     )
     customer = models.CharField(_('Customer'), max_length=100, blank=True)
     notes = models.TextField(_('Notes'), blank=True)
+    # Values of the custom fields defined for income, keyed by field_name
+    custom_data = models.JSONField(_('Custom Data'), default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = IncomeRecordManager()
+
     def __str__(self):
         return f"{self.date} - {self.category}: {self.total_amount}"
 
+    @classmethod
+    def resolve_total_amount(cls, quantity, unit_price, total_amount):
+        """
+        Return total_amount, or quantity * unit_price rounded to cents when it is empty or zero and both
+        are provided. Shared by save() and IncomeRecordForm.clean() so the fallback rule lives in one place.
+        """
+        if not total_amount and quantity is not None and unit_price is not None:
+            # Callers sometimes pass floats or ints; convert them the way the fields would before multiplying
+            quantity = cls._meta.get_field('quantity').to_python(quantity)
+            unit_price = cls._meta.get_field('unit_price').to_python(unit_price)
+            return (quantity * unit_price).quantize(Decimal('0.01'))
+        return total_amount
+
     def save(self, *args, **kwargs):
         # If both quantity and unit_price are provided and total_amount is empty, calculate it.
-        if self.quantity is not None and self.unit_price is not None and (self.total_amount is None or self.total_amount == 0):
-            self.total_amount = self.quantity * self.unit_price
+        self.total_amount = self.resolve_total_amount(self.quantity, self.unit_price, self.total_amount)
         super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = _('Income Record')
         verbose_name_plural = _('Income Records')
         ordering = ['-date']
+        indexes = [
+            # Backs date-range reports and the admin's category/date filters
+            models.Index(fields=['date', 'category'], name='income_date_category_idx'),
+            # Backs the API's related_buffalo filter together with the default -date ordering
+            models.Index(fields=['related_buffalo', 'date'], name='income_buffalo_date_idx'),
+        ]
 
 
 # ------------------- Loan Model -------------------
+def _amortization_cents(principal, annual_interest_rate, tenure_months, emi):
+    """
+    Returns the (interest, principal, outstanding balance) of every installment as int64 arrays of cents.
+
+    Opening balances use the closed form B_k = P(1+r)^k - EMI((1+r)^k - 1) / r for all months in one NumPy
+    pass instead of stepping month by month. Interest is rounded to the cent and the rest of the EMI repays
+    principal; the final installment (or the first one that would overpay) repays exactly what is left, so
+    the principal components always add up to the loan amount.
+    """
+    if not tenure_months:
+        no_installments = np.zeros(0, dtype=np.int64)
+        return no_installments, no_installments, no_installments
+    p = float(principal)
+    r = float(annual_interest_rate) / 1200.0
+    months = np.arange(tenure_months)
+    if r:
+        factors = (1.0 + r) ** months
+        opening = p * factors - float(emi) * (factors - 1.0) / r
+    else:
+        opening = p - float(emi) * months
+    interest = np.rint(np.maximum(opening, 0.0) * r * 100).astype(np.int64)
+
+    principal_cents = int(principal * 100)
+    repaid = int(emi * 100) - interest
+    repaid_to_date = np.cumsum(repaid)
+    last = min(int(np.searchsorted(repaid_to_date, principal_cents)), tenure_months - 1)
+    interest, repaid = interest[:last + 1], repaid[:last + 1]
+    repaid[-1] = principal_cents - (repaid_to_date[last - 1] if last else 0)
+    return interest, repaid, principal_cents - np.cumsum(repaid)
+
+
+def _from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class LoanQuerySet(models.QuerySet):
+    def with_full_history(self):
+        """
+        Loans with their payments (newest first) and each payment's interest expense prefetched,
+        so iterating loan.payments.all() and payment.related_interest_expense runs no further queries.
+        """
+        return self.prefetch_related(Prefetch(
+            'payments',
+            queryset=LoanPayment.objects.select_related('related_interest_expense').order_by('-payment_date'),
+        ))
+
+
+LoanManager = models.Manager.from_queryset(LoanQuerySet)
+
+
 class Loan(models.Model):
     """
     Model for tracking loan details.
@@ -180,6 +384,8 @@ class Loan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = LoanManager()
+
     def __str__(self):
         return f"{self.loan_name} - {self.principal_amount} ({self.get_status_display()})"
 
@@ -191,14 +397,20 @@ class Loan(models.Model):
             P = principal_amount,
             r = monthly interest rate (annual_interest_rate / 12 / 100),
             n = tenure_months.
+        The formula is evaluated in floats (Decimal powers get slow for long tenures) and only the
+        result is converted back to a 2-place Decimal. An interest-free loan is repaid as P / n.
         """
-        p = self.principal_amount
-        r = self.annual_interest_rate / Decimal(12 * 100)  # Convert to monthly decimal rate
-        n = self.tenure_months
+        p = float(self.principal_amount)
+        r = float(self.annual_interest_rate) / 1200.0  # Convert to monthly decimal rate
+        n = int(self.tenure_months)
         try:
-            emi = (p * r * (1 + r) ** n) / (((1 + r) ** n) - 1)
-            return round(emi, 2)
-        except (ZeroDivisionError, ValueError):
+            if r:
+                factor = (1.0 + r) ** n
+                emi = (p * r * factor) / (factor - 1.0)
+            else:
+                emi = p / n
+            return Decimal(f"{emi:.2f}")
+        except (ZeroDivisionError, OverflowError):
             return Decimal('0.00')
 
     def save(self, *args, **kwargs):
@@ -207,6 +419,60 @@ class Loan(models.Model):
             self.emi_amount = self.calculate_emi()
         super().save(*args, **kwargs)
 
+    def generate_schedule(self, through=None, batch_size=1000):
+        """
+        Records the loan's monthly EMI payments, one month after another from loan_start_date, and their
+        interest expenses. Stops after the final installment or at the last payment date on or before `through`.
+
+        The amounts come from _amortization_cents(): each month's interest is the outstanding balance times
+        the monthly rate, the rest of the EMI repays principal, and the final installment clears the balance.
+        The rows are written with bulk_create (payments, then their expenses) and one bulk_update linking
+        them, instead of running LoanPayment.save() per month. Returns the created payments.
+        """
+        if self.payments.exists():
+            raise ValueError(f"Loan {self.pk} already has payments recorded")
+        emi = self.emi_amount or self.calculate_emi()
+        interest, principal, balance = _amortization_cents(
+            self.principal_amount, self.annual_interest_rate, self.tenure_months, emi
+        )
+        payments = []
+        for month, (interest_cents, principal_cents, balance_cents) in enumerate(
+            zip(interest.tolist(), principal.tolist(), balance.tolist()), start=1
+        ):
+            payment_date = self.loan_start_date + relativedelta(months=month)
+            if through is not None and payment_date > through:
+                break
+            payments.append(LoanPayment(
+                loan=self, payment_date=payment_date,
+                amount_paid=_from_cents(principal_cents + interest_cents),
+                principal_component=_from_cents(principal_cents),
+                interest_component=_from_cents(interest_cents),
+                outstanding_balance=_from_cents(balance_cents)
+            ))
+
+        with transaction.atomic():
+            LoanPayment.objects.bulk_create(payments, batch_size=batch_size)
+            interest_payments = [payment for payment in payments if payment.interest_component > 0]
+            expenses = ExpenseRecord.objects.bulk_create([
+                ExpenseRecord(
+                    date=payment.payment_date,
+                    category_id=_get_loan_interest_category_id(),
+                    description=f"Interest payment for loan: {self.loan_name}",
+                    amount=payment.interest_component,
+                    related_module='LoanPayment',
+                    related_record_id=payment.payment_id
+                )
+                for payment in interest_payments
+            ], batch_size=batch_size)
+            for payment, expense in zip(interest_payments, expenses):
+                payment.related_interest_expense = expense
+            LoanPayment.objects.bulk_update(interest_payments, ['related_interest_expense'], batch_size=batch_size)
+            if payments and payments[-1].outstanding_balance <= 0:
+                # Guarded on the stored status rather than this instance's, which may be stale
+                Loan.objects.filter(pk=self.pk).exclude(status=self.STATUS_PAID).update(status=self.STATUS_PAID)
+                self.status = self.STATUS_PAID
+        return payments
+
     class Meta:
         verbose_name = _('Loan')
         verbose_name_plural = _('Loans')
@@ -214,6 +480,16 @@ class Loan(models.Model):
 
 
 # ------------------- Loan Payment -------------------
+@functools.lru_cache(maxsize=None)
+def _get_loan_interest_category_id():
+    """Return the id of the 'Loan Interest' expense category, creating it on first use."""
+    category, _created = ExpenseCategory.objects.get_or_create(
+        name='Loan Interest',
+        defaults={'is_direct_cost': False, 'description': 'Interest payment for loans'}
+    )
+    return category.pk
+
+
 class LoanPayment(models.Model):
     """
     Model for tracking each loan payment.
@@ -222,7 +498,8 @@ class LoanPayment(models.Model):
     """
     payment_id = models.AutoField(primary_key=True)
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='payments')
-    payment_date = models.DateField(_('Payment Date'))
+    # Indexed for the monthly principal repayment total in calculate_monthly_profitability()
+    payment_date = models.DateField(_('Payment Date'), db_index=True)
     amount_paid = models.DecimalField(_('Amount Paid'), max_digits=12, decimal_places=2)
     principal_component = models.DecimalField(_('Principal Component'), max_digits=12, decimal_places=2)
     interest_component = models.DecimalField(_('Interest Component'), max_digits=12, decimal_places=2)
@@ -239,33 +516,61 @@ class LoanPayment(models.Model):
         return f"{self.loan.loan_name} - Payment on {self.payment_date}: {self.amount_paid}"
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # If there is no linked interest expense and interest_component > 0, create it.
-        if not self.related_interest_expense and self.interest_component > 0:
-            try:
-                loan_interest_category, created = ExpenseCategory.objects.get_or_create(
-                    name='Loan Interest',
-                    defaults={'is_direct_cost': False, 'description': 'Interest payment for loans'}
+        with transaction.atomic():
+            # If there is no linked interest expense and interest_component > 0, create it first,
+            # so the payment row is written with the link in a single INSERT (or UPDATE).
+            expense = None
+            if not self.related_interest_expense_id and self.interest_component > 0:
+                expense = self._create_interest_expense()
+                update_fields = kwargs.get('update_fields')
+                if expense and update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'related_interest_expense'}
+            super().save(*args, **kwargs)
+            # A new payment only has its id now; point the expense back at it.
+            if expense and expense.related_record_id is None:
+                ExpenseRecord.objects.filter(pk=expense.pk).update(related_record_id=self.pk)
+                expense.related_record_id = self.pk
+            # Mark the loan paid off once the outstanding balance is zero or negative.
+            if self.outstanding_balance <= 0:
+                paid_off = Loan.objects.filter(pk=self.loan_id).exclude(status=Loan.STATUS_PAID).update(
+                    status=Loan.STATUS_PAID
                 )
-                expense = ExpenseRecord.objects.create(
-                    date=self.payment_date,
-                    category=loan_interest_category,
-                    description=f"Interest payment for loan: {self.loan.loan_name}",
-                    amount=self.interest_component,
-                    related_module='LoanPayment',
-                    related_record_id=self.payment_id,
-                    notes=self.notes
-                )
-                # Link the newly created expense to this payment and update the record
-                self.related_interest_expense = expense
-                self.save(update_fields=['related_interest_expense'])
-            except Exception as e:
-                # In production, log the error appropriately
-                pass
-        # Update the loan's status if the outstanding balance is zero or negative.
-        if self.outstanding_balance <= 0 and self.loan.status != Loan.STATUS_PAID:
-            self.loan.status = Loan.STATUS_PAID
-            self.loan.save(update_fields=['status'])
+                if paid_off and LoanPayment.loan.is_cached(self):
+                    self.loan.status = Loan.STATUS_PAID
+
+    def _create_interest_expense(self):
+        """
+        Record the interest part of this payment as an expense and attach it to this (not yet saved) payment.
+        Returns the expense, or None if it could not be created.
+        """
+        try:
+            # Savepoint so a failed lookup or insert doesn't break the enclosing save() transaction
+            with transaction.atomic():
+                # Only the loan's name is needed; don't load the whole row for a payment created from loan_id.
+                if LoanPayment.loan.is_cached(self):
+                    loan_name = self.loan.loan_name
+                else:
+                    loan_name = Loan.objects.filter(pk=self.loan_id).values_list('loan_name', flat=True).get()
+                fields = {
+                    'date': self.payment_date,
+                    'category_id': _get_loan_interest_category_id(),
+                    'description': f"Interest payment for loan: {loan_name}",
+                    'amount': self.interest_component,
+                    'notes': self.notes,
+                }
+                if self.pk:
+                    # A saved payment's expense may already exist without the link (e.g. written by a concurrent
+                    # save); look it up by its payment id so it is reused instead of duplicated.
+                    expense, created = ExpenseRecord.objects.update_or_create(
+                        related_module='LoanPayment', related_record_id=self.pk, defaults=fields
+                    )
+                else:
+                    expense = ExpenseRecord.objects.create(related_module='LoanPayment', **fields)
+        except DatabaseError:
+            logger.exception('Failed to create interest expense for payment on loan %s', self.loan_id)
+            return None
+        self.related_interest_expense = expense
+        return expense
 
     class Meta:
         verbose_name = _('Loan Payment')
@@ -290,7 +595,7 @@ class Profitability(models.Model):
     roi = models.DecimalField(_('Return on Investment (%)'), max_digits=7, decimal_places=2, default=0)
     # Cash Surplus is calculated by adding back non-cash expenses and subtracting actual outflows like principal repayments.
     cash_surplus = models.DecimalField(max_digits=15, decimal_places=2, default=0)
-    calculated_at = models.DateTimeField(auto_now_add=True)
+    calculated_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         unique_together = ('year', 'month')
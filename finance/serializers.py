@@ -9,6 +9,10 @@ from rest_framework import serializers
 from .models import ExpenseCategory, IncomeCategory, ExpenseRecord, IncomeRecord, Profitability
 from herd.serializers import BuffaloListSerializer  # Serializer to represent Buffalo details succinctly
 
+# Month names indexed by month number - 1; built once instead of for every serialized row.
+MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December')
+
 # ---------------- Expense Category Serializer ----------------
 class ExpenseCategorySerializer(serializers.ModelSerializer):
     """
@@ -98,6 +102,4 @@ class ProfitabilitySerializer(serializers.ModelSerializer):
 
     def get_month_name(self, obj):
         # Convert numeric month to a full month name.
-        month_names = ['January', 'February', 'March', 'April', 'May', 'June',
-                       'July', 'August', 'September', 'October', 'November', 'December']
-        return month_names[obj.month - 1]
+        return MONTH_NAMES[obj.month - 1]
@@ -2,24 +2,31 @@
 finance/signals.py
 
 Defines Django signals to update dependent models when finance data changes.
-For example, when an ExpenseRecord is saved, update the cumulative cost of the related buffalo.
+For example, when an ExpenseRecord is deleted, remove its amount from the related buffalo's cumulative cost.
+Saves are handled in ExpenseRecord.save(), which applies only the change in amount.
 """
 
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
-from decimal import Decimal
-from django.db.models import Sum
-from .models import ExpenseRecord, Buffalo
+from .models import ExpenseCategory, ExpenseRecord, Buffalo, _get_loan_interest_category_id
 
-@receiver(post_save, sender=ExpenseRecord)
-def update_buffalo_cumulative_cost(sender, instance, **kwargs):
+@receiver(post_delete, sender=ExpenseRecord)
+def subtract_deleted_expense_from_buffalo(sender, instance, **kwargs):
     """
-    Signal triggered after an ExpenseRecord is saved.
-    This function recalculates the cumulative cost for the related buffalo and updates it.
+    Signal triggered after an ExpenseRecord is deleted.
+    This function subtracts the expense amount from the related buffalo's cumulative cost.
     """
-    if instance.related_buffalo:
-        total_cost = ExpenseRecord.objects.filter(related_buffalo=instance.related_buffalo).aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0.00')
-        instance.related_buffalo.cumulative_cost = total_cost
-        instance.related_buffalo.save(update_fields=['cumulative_cost'])
+    if instance.related_buffalo_id and instance.amount:
+        Buffalo.objects.filter(pk=instance.related_buffalo_id).update(
+            cumulative_cost=F('cumulative_cost') - instance.amount
+        )
+
+
+@receiver(post_delete, sender=ExpenseCategory)
+def forget_loan_interest_category(sender, instance, **kwargs):
+    """
+    Signal triggered after an ExpenseCategory is deleted.
+    Clears the cached 'Loan Interest' category id so the next loan payment looks it up (or re-creates it) again.
+    """
+    _get_loan_interest_category_id.cache_clear()
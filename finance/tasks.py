@@ -0,0 +1,53 @@
+"""
+finance/tasks.py
+
+Celery tasks for the finance module.
+They are routed to the "reports" queue (see CELERY_TASK_ROUTES) so report work runs on dedicated workers
+instead of competing with web requests.
+"""
+
+from celery import shared_task
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.utils import timezone
+
+from .utils import calculate_monthly_profitability
+
+# Held from the moment a month's recalculation is queued until the task finishes, so repeated requests
+# for the same month queue it once. The timeout frees the month again if a task is lost.
+PROFITABILITY_TASK_LOCK_KEY = 'finance:profitability_task:{year}:{month}'
+PROFITABILITY_TASK_LOCK_TIMEOUT = 60
+
+
+@shared_task
+def run_monthly_profitability_task(year=None, month=None):
+    """
+    Recalculate the Profitability record for a month.
+    Defaults to the previous month, since celery beat runs this on the 1st of each month.
+    Returns the primary key of the updated record.
+    """
+    if year is None or month is None:
+        previous_month = timezone.now().date() - relativedelta(months=1)
+        year, month = previous_month.year, previous_month.month
+    try:
+        record = calculate_monthly_profitability(year, month)
+    finally:
+        cache.delete(PROFITABILITY_TASK_LOCK_KEY.format(year=year, month=month))
+    return record.pk
+
+
+def queue_monthly_profitability(year, month):
+    """
+    Queue run_monthly_profitability_task for a month unless one is already pending for it.
+    Returns True if a task was queued.
+    """
+    lock_key = PROFITABILITY_TASK_LOCK_KEY.format(year=year, month=month)
+    if not cache.add(lock_key, True, PROFITABILITY_TASK_LOCK_TIMEOUT):
+        return False
+    try:
+        run_monthly_profitability_task.delay(year, month)
+    except Exception:
+        # Nothing was queued; don't block the month until the lock expires
+        cache.delete(lock_key)
+        raise
+    return True
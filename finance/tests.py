@@ -11,7 +11,12 @@ Tests cover:
 For a production-grade system, these tests provide comprehensive coverage and validation of core business logic.
 """
 
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, connection, transaction
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from decimal import Decimal
@@ -23,6 +28,7 @@ from rest_framework.test import APIClient
 
 # Import models from the finance app and any required models from other apps.
 from .models import ExpenseCategory, IncomeCategory, ExpenseRecord, IncomeRecord, Profitability, Loan, LoanPayment
+from .models import _get_loan_interest_category_id
 from herd.models import Buffalo
 from configuration.models import GlobalSettings
 
@@ -284,3 +290,649 @@ class FinanceIntegrationTest(TestCase):
         # Refresh buffalo instance from DB and verify cumulative_cost is updated.
         self.buffalo.refresh_from_db()
         self.assertEqual(self.buffalo.cumulative_cost, Decimal("250.00"))
+
+
+# -------------------------
+# Form Tests
+# -------------------------
+class FinanceFormsTest(TestCase):
+    def setUp(self):
+        from configuration.models import CustomFieldDefinition
+        cache.clear()
+        self.expense_cat = ExpenseCategory.objects.create(name="Form Expense", is_direct_cost=True)
+        CustomFieldDefinition.objects.create(
+            target_model=CustomFieldDefinition.TARGET_EXPENSE,
+            field_name="invoice_date",
+            field_label="Invoice Date",
+            field_type="DATE"
+        )
+
+    def test_expense_form_stores_custom_fields(self):
+        """
+        Test that custom fields defined for expenses are rendered and saved into custom_data.
+        """
+        from .forms import ExpenseRecordForm
+        form = ExpenseRecordForm.for_custom_fields()(data={
+            'date': '2025-04-01',
+            'category': self.expense_cat.id,
+            'description': 'Diesel',
+            'amount': '120.00',
+            'custom_invoice_date': '2025-03-30',
+        })
+        self.assertIn('custom_invoice_date', form.fields)
+        self.assertTrue(form.is_valid(), form.errors)
+        expense = form.save()
+        expense.refresh_from_db()
+        self.assertEqual(expense.custom_data, {'invoice_date': '2025-03-30'})
+
+        # The form class is reused while the definitions are unchanged, and edits start from the stored value.
+        edit_form_class = ExpenseRecordForm.for_custom_fields()
+        self.assertIs(edit_form_class, ExpenseRecordForm.for_custom_fields())
+        self.assertEqual(edit_form_class(instance=expense)['custom_invoice_date'].value(), '2025-03-30')
+
+    def test_form_without_custom_fields_is_the_plain_form(self):
+        """
+        Test that a target with no custom field definitions gets the plain form class and an untouched custom_data.
+        """
+        from .forms import IncomeRecordForm
+        form_class = IncomeRecordForm.for_custom_fields()
+        self.assertIs(form_class, IncomeRecordForm)
+        category = IncomeCategory.objects.create(name="Plain Income")
+        form = form_class(data={'date': '2025-04-01', 'category': category.id, 'description': 'Calf sale',
+                                'total_amount': '300.00'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().custom_data, {})
+
+    def test_edit_form_writes_only_changed_columns(self):
+        """
+        Test that editing an expense updates just the changed columns, custom_data and the timestamp.
+        """
+        from .forms import ExpenseRecordForm
+        expense = ExpenseRecord.objects.create(date=date(2025, 4, 1), category=self.expense_cat,
+                                               description="Diesel", amount=Decimal("120.00"))
+        form_class = ExpenseRecordForm.for_custom_fields()
+        form = form_class(instance=expense, data={
+            'date': '2025-04-01', 'category': self.expense_cat.id, 'description': 'Diesel',
+            'amount': '150.00', 'custom_invoice_date': '2025-03-30',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as queries:
+            form.save()
+        update_sql, = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "finance_expenserecord"')]
+        self.assertIn('"amount"', update_sql)
+        self.assertIn('"custom_data"', update_sql)
+        self.assertIn('"updated_at"', update_sql)
+        self.assertNotIn('"description"', update_sql)
+        expense.refresh_from_db()
+        self.assertEqual((expense.amount, expense.custom_data), (Decimal("150.00"), {'invoice_date': '2025-03-30'}))
+
+    def test_forms_apply_bootstrap_classes_by_widget_type(self):
+        """
+        Test that form widgets get 'form-control', checkboxes get 'form-check-input', and repeat instances match.
+        """
+        from .forms import ExpenseCategoryForm, ExpenseRecordForm
+        for _ in range(2):
+            form = ExpenseCategoryForm()
+            self.assertEqual(form.fields['name'].widget.attrs['class'], 'form-control')
+            self.assertEqual(form.fields['is_direct_cost'].widget.attrs['class'], 'form-check-input')
+        form = ExpenseRecordForm()
+        self.assertEqual(form.fields['category'].widget.attrs['class'], 'form-control')
+        self.assertEqual(form.fields['date'].widget.input_type, 'date')
+
+    def test_income_form_fills_total_from_quantity_and_price(self):
+        """
+        Test that a zero total is replaced by quantity * unit_price and a missing price is rejected.
+        """
+        from .forms import IncomeRecordForm
+        category = IncomeCategory.objects.create(name="Form Income")
+        data = {'date': '2025-04-01', 'category': category.id, 'description': 'Milk',
+                'quantity': '12.50', 'unit_price': '4.00', 'total_amount': '0.00'}
+        form = IncomeRecordForm(data=data)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().total_amount, Decimal("50.00"))
+
+        form = IncomeRecordForm(data=dict(data, unit_price=''))
+        self.assertIn('total_amount', form.errors)
+
+    def test_buffalo_choices_are_cached_until_a_buffalo_changes(self):
+        """
+        Test that record forms render active-buffalo options from the cache and pick up new or sold buffaloes.
+        """
+        from herd.models import Breed
+        from .forms import ExpenseRecordForm
+        breed = Breed.objects.create(name="Murrah")
+        first = Buffalo.objects.create(buffalo_id="C1", breed=breed, date_of_birth=date(2020, 1, 1), gender="FEMALE")
+        self.assertEqual(len(list(ExpenseRecordForm().fields['related_buffalo'].choices)), 2)
+        with self.assertNumQueries(0):
+            ExpenseRecordForm()['related_buffalo'].as_widget()
+
+        Buffalo.objects.create(buffalo_id="C2", breed=breed, date_of_birth=date(2020, 1, 1), gender="FEMALE")
+        first.is_active = False
+        first.save()
+        labels = [label for _value, label in ExpenseRecordForm().fields['related_buffalo'].choices]
+        self.assertEqual(labels[1:], ["C2 - Unnamed"])
+
+        form = ExpenseRecordForm(data={'date': '2025-04-01', 'category': self.expense_cat.id, 'description': 'Feed',
+                                       'amount': '5.00', 'related_buffalo': first.pk})
+        self.assertIn('related_buffalo', form.errors)
+
+
+# -------------------------
+# Buffalo Cumulative Cost Tests
+# -------------------------
+class BuffaloCumulativeCostTest(TestCase):
+    def setUp(self):
+        from herd.models import Breed
+        breed = Breed.objects.create(name="Murrah")
+        self.expense_cat = ExpenseCategory.objects.create(name="Cost Expense", is_direct_cost=True)
+        self.buffalo_a = Buffalo.objects.create(
+            buffalo_id="A1", breed=breed, date_of_birth=date(2020, 1, 1), gender=Buffalo.GENDER_FEMALE
+        )
+        self.buffalo_b = Buffalo.objects.create(
+            buffalo_id="B1", breed=breed, date_of_birth=date(2020, 1, 1), gender=Buffalo.GENDER_FEMALE
+        )
+
+    def assertCosts(self, cost_a, cost_b):
+        self.buffalo_a.refresh_from_db()
+        self.buffalo_b.refresh_from_db()
+        self.assertEqual(self.buffalo_a.cumulative_cost, Decimal(cost_a))
+        self.assertEqual(self.buffalo_b.cumulative_cost, Decimal(cost_b))
+
+    def test_cost_follows_create_update_move_and_delete(self):
+        """
+        Test that the buffalo cumulative cost tracks expense creation, amount changes, reassignment and deletion.
+        """
+        expense = ExpenseRecord.objects.create(
+            date=date(2025, 4, 1), category=self.expense_cat, description="Feed",
+            amount=Decimal("100.00"), related_buffalo=self.buffalo_a
+        )
+        ExpenseRecord.objects.create(
+            date=date(2025, 4, 2), category=self.expense_cat, description="Vet",
+            amount=Decimal("40.00"), related_buffalo=self.buffalo_a
+        )
+        self.assertCosts("140.00", "0.00")
+
+        expense = ExpenseRecord.objects.get(pk=expense.pk)
+        expense.amount = Decimal("75.00")
+        expense.save()
+        self.assertCosts("115.00", "0.00")
+
+        expense.related_buffalo = self.buffalo_b
+        expense.save()
+        self.assertCosts("40.00", "75.00")
+
+        expense.delete()
+        self.assertCosts("40.00", "0.00")
+
+    def test_metadata_only_save_leaves_buffalo_alone(self):
+        """
+        Test that a save limited to fields other than amount and buffalo issues only the expense UPDATE.
+        """
+        ExpenseRecord.objects.create(
+            date=date(2025, 4, 1), category=self.expense_cat, description="Feed",
+            amount=Decimal("100.00"), related_buffalo=self.buffalo_a
+        )
+        expense = ExpenseRecord.objects.only('expense_id', 'description').get()
+        expense.description = "Green fodder"
+        with self.assertNumQueries(1):
+            expense.save(update_fields=['description'])
+        self.assertCosts("100.00", "0.00")
+
+    def test_bulk_create_adds_totals_per_buffalo(self):
+        """
+        Test that bulk-created expenses add their summed amounts to each buffalo with one update per buffalo.
+        """
+        records = [
+            ExpenseRecord(date=date(2025, 4, 1), category=self.expense_cat, description="Feed",
+                          amount=Decimal("10.00"), related_buffalo=buffalo)
+            for buffalo in (self.buffalo_a, self.buffalo_a, self.buffalo_b)
+        ] + [ExpenseRecord(date=date(2025, 4, 1), category=self.expense_cat, description="Shed",
+                           amount=Decimal("99.00"))]
+        ExpenseRecord.bulk_create_with_buffalo_totals(records)
+        self.assertCosts("20.00", "10.00")
+
+    def test_recalculate_buffalo_costs_in_one_update(self):
+        """
+        Test that rows written without save() are reconciled for every buffalo by a single UPDATE.
+        """
+        ExpenseRecord.objects.bulk_create([
+            ExpenseRecord(date=date(2025, 4, 1), category=self.expense_cat, description="Feed",
+                          amount=amount, related_buffalo=self.buffalo_a)
+            for amount in (Decimal("12.50"), Decimal("7.50"))
+        ])
+        Buffalo.objects.filter(pk=self.buffalo_b.pk).update(cumulative_cost=Decimal("55.00"))
+        with self.assertNumQueries(1):
+            self.assertEqual(ExpenseRecord.recalculate_buffalo_costs(), 2)
+        self.assertCosts("20.00", "0.00")
+
+    def test_refresh_from_db_resets_the_loaded_amount(self):
+        """
+        Test that a save after refresh_from_db() takes its delta against the refreshed amount, not the first load.
+        """
+        ExpenseRecord.objects.create(
+            date=date(2025, 4, 1), category=self.expense_cat, description="Feed",
+            amount=Decimal("100.00"), related_buffalo=self.buffalo_a
+        )
+        expense = ExpenseRecord.objects.get()
+        ExpenseRecord.objects.filter(pk=expense.pk).update(amount=Decimal("150.00"))
+        ExpenseRecord.recalculate_buffalo_cost(self.buffalo_a.pk)
+        expense.refresh_from_db()
+        expense.notes = "Checked"
+        expense.save()
+        self.assertCosts("150.00", "0.00")
+
+
+# -------------------------
+# Loan EMI Tests
+# -------------------------
+class LoanEMITest(TestCase):
+    def test_calculate_emi(self):
+        """
+        Test the EMI formula, the interest-free case and a zero tenure.
+        """
+        loan = Loan(principal_amount=Decimal("100000.00"), annual_interest_rate=Decimal("12.00"), tenure_months=12)
+        self.assertEqual(loan.calculate_emi(), Decimal("8884.88"))
+        loan.annual_interest_rate = Decimal("0.00")
+        self.assertEqual(loan.calculate_emi(), Decimal("8333.33"))
+        loan.tenure_months = 0
+        self.assertEqual(loan.calculate_emi(), Decimal("0.00"))
+
+
+# -------------------------
+# Loan Payment Tests
+# -------------------------
+class LoanPaymentInterestTest(TestCase):
+    def setUp(self):
+        _get_loan_interest_category_id.cache_clear()
+        self.loan = Loan.objects.create(
+            loan_name="Tractor Loan", issuer="Bank", principal_amount=Decimal("12000.00"),
+            annual_interest_rate=Decimal("12.00"), loan_start_date=date(2025, 1, 1), tenure_months=12
+        )
+
+    def make_payment(self, payment_date):
+        return LoanPayment.objects.create(
+            loan=self.loan, payment_date=payment_date, amount_paid=Decimal("1066.19"),
+            principal_component=Decimal("946.19"), interest_component=Decimal("120.00"),
+            outstanding_balance=Decimal("11053.81")
+        )
+
+    def test_interest_expenses_share_the_cached_category(self):
+        """
+        Test that each payment's interest expense lands in 'Loan Interest' without looking the category up again.
+        """
+        first = self.make_payment(date(2025, 2, 1))
+        with CaptureQueriesContext(connection) as queries:
+            second = self.make_payment(date(2025, 3, 1))
+        self.assertFalse([q for q in queries if 'finance_expensecategory' in q['sql']])
+        self.assertEqual(first.related_interest_expense.category_id, second.related_interest_expense.category_id)
+        self.assertEqual(first.related_interest_expense.category.name, 'Loan Interest')
+        self.assertEqual(ExpenseRecord.objects.filter(category__name='Loan Interest').count(), 2)
+
+    def test_failed_interest_expense_is_logged_and_payment_saved(self):
+        """
+        Test that a database error while recording the interest is logged and rolled back to its savepoint only.
+        """
+        with mock.patch.object(ExpenseRecord.objects, 'create', side_effect=DatabaseError('insert failed')), \
+                self.assertLogs('finance.models', level='ERROR'):
+            payment = self.make_payment(date(2025, 2, 1))
+        payment.refresh_from_db()
+        self.assertIsNone(payment.related_interest_expense)
+        self.assertFalse(ExpenseRecord.objects.filter(related_module='LoanPayment').exists())
+
+    def test_deleting_the_category_clears_the_cached_id(self):
+        """
+        Test that deleting the 'Loan Interest' category makes the next lookup create a fresh one.
+        """
+        ExpenseCategory.objects.get(pk=_get_loan_interest_category_id()).delete()
+        category_id = _get_loan_interest_category_id()
+        self.assertTrue(ExpenseCategory.objects.filter(pk=category_id, name='Loan Interest').exists())
+
+    def test_final_payment_marks_loan_paid_off(self):
+        """
+        Test that the interest expense is linked in the database and a zero balance pays off the loan.
+        """
+        payment = LoanPayment.objects.create(
+            loan=self.loan, payment_date=date(2025, 12, 1), amount_paid=Decimal("1000.00"),
+            principal_component=Decimal("990.00"), interest_component=Decimal("10.00"),
+            outstanding_balance=Decimal("0.00")
+        )
+        self.assertEqual(self.loan.status, Loan.STATUS_PAID)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.status, Loan.STATUS_PAID)
+        payment.refresh_from_db()
+        self.assertEqual(payment.related_interest_expense.amount, Decimal("10.00"))
+
+    def test_payment_is_inserted_once_with_its_interest_expense(self):
+        """
+        Test that the payment row is written by one INSERT carrying the expense link, and the expense points back.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            payment = self.make_payment(date(2025, 2, 1))
+        payment_writes = [q['sql'] for q in queries if q['sql'].startswith(('INSERT INTO "finance_loanpayment"',
+                                                                           'UPDATE "finance_loanpayment"'))]
+        self.assertEqual(len(payment_writes), 1)
+        self.assertTrue(payment_writes[0].startswith('INSERT'))
+        stored = LoanPayment.objects.select_related('related_interest_expense').get(pk=payment.pk)
+        self.assertEqual(stored.related_interest_expense.related_record_id, payment.pk)
+
+    def test_saved_payment_reuses_its_unlinked_interest_expense(self):
+        """
+        Test that re-saving a payment whose link was lost updates its existing expense instead of adding another.
+        """
+        payment = self.make_payment(date(2025, 2, 1))
+        expense_id = payment.related_interest_expense_id
+        LoanPayment.objects.filter(pk=payment.pk).update(related_interest_expense=None)
+        payment = LoanPayment.objects.get(pk=payment.pk)
+        payment.interest_component = Decimal("110.00")
+        payment.save()
+        self.assertEqual(payment.related_interest_expense_id, expense_id)
+        self.assertEqual(ExpenseRecord.objects.get(related_module='LoanPayment').amount, Decimal("110.00"))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ExpenseRecord.objects.create(date=date(2025, 2, 1), category_id=_get_loan_interest_category_id(),
+                                         description="Duplicate", amount=Decimal("1.00"),
+                                         related_module='LoanPayment', related_record_id=payment.pk)
+
+    def test_with_full_history_prefetches_payments_and_expenses(self):
+        """
+        Test that the loans, then their payments joined to the interest expenses, load in two queries.
+        """
+        self.loan.generate_schedule(through=date(2025, 4, 1))
+        with self.assertNumQueries(2):
+            loan, = Loan.objects.with_full_history()
+            payments = list(loan.payments.all())
+            amounts = [payment.related_interest_expense.amount for payment in payments]
+        self.assertEqual([payment.payment_date for payment in payments],
+                         [date(2025, 4, 1), date(2025, 3, 1), date(2025, 2, 1)])
+        self.assertEqual(amounts[-1], Decimal("120.00"))
+
+    def test_payment_by_loan_id_does_not_load_the_loan(self):
+        """
+        Test that saving a payment created from loan_id reads only the loan name and never instantiates the loan.
+        """
+        payment = LoanPayment(
+            loan_id=self.loan.pk, payment_date=date(2025, 4, 1), amount_paid=Decimal("1066.19"),
+            principal_component=Decimal("946.19"), interest_component=Decimal("120.00"),
+            outstanding_balance=Decimal("0.00")
+        )
+        payment.save()
+        self.assertFalse(LoanPayment.loan.is_cached(payment))
+        self.assertEqual(payment.related_interest_expense.description, "Interest payment for loan: Tractor Loan")
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.status, Loan.STATUS_PAID)
+
+    def test_generate_schedule_bulk_records_payments_and_interest(self):
+        """
+        Test that the schedule repays the principal exactly, links each interest expense and pays off the loan.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            payments = self.loan.generate_schedule()
+        inserts = [q['sql'] for q in queries
+                   if q['sql'].startswith(('INSERT INTO "finance_loanpayment"', 'INSERT INTO "finance_expenserecord"'))]
+        self.assertEqual(len(inserts), 2)  # One batch of payments and one of interest expenses
+        self.assertEqual(len(payments), 12)
+        self.assertEqual(sum(payment.principal_component for payment in payments), Decimal("12000.00"))
+        self.assertEqual(payments[0].interest_component, Decimal("120.00"))
+        self.assertEqual(payments[-1].outstanding_balance, Decimal("0.00"))
+        self.assertEqual(payments[0].payment_date, date(2025, 2, 1))
+
+        stored = LoanPayment.objects.select_related('related_interest_expense').get(payment_date=date(2025, 2, 1))
+        self.assertEqual(stored.related_interest_expense.amount, Decimal("120.00"))
+        self.assertEqual(stored.related_interest_expense.related_record_id, stored.pk)
+        self.assertEqual(ExpenseRecord.objects.filter(related_module='LoanPayment').count(), 12)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.status, Loan.STATUS_PAID)
+
+    def test_generate_schedule_through_date_keeps_loan_active(self):
+        """
+        Test that a partial schedule stops at the given date and leaves the loan active.
+        """
+        payments = self.loan.generate_schedule(through=date(2025, 4, 15))
+        self.assertEqual([payment.payment_date.month for payment in payments], [2, 3, 4])
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.status, Loan.STATUS_ACTIVE)
+        with self.assertRaises(ValueError):
+            self.loan.generate_schedule()
+
+
+# -------------------------
+# Income Record Bulk Create Tests
+# -------------------------
+class IncomeRecordBulkCreateTest(TestCase):
+    def test_bulk_create_fills_missing_totals(self):
+        """
+        Test that bulk_create computes empty totals from quantity and unit price and keeps given ones.
+        """
+        milk = IncomeCategory.objects.create(name="Milk Sales")
+        with self.assertNumQueries(1):
+            IncomeRecord.objects.bulk_create([
+                IncomeRecord(date=date(2025, 1, 1), category=milk, description="Milk",
+                             quantity=Decimal("12.35"), unit_price=Decimal("2.40")),
+                IncomeRecord(date=date(2025, 1, 2), category=milk, description="Milk",
+                             quantity=Decimal("10.00"), unit_price=Decimal("2.50"), total_amount=Decimal("30.00")),
+            ])
+        self.assertEqual(list(IncomeRecord.objects.order_by('date').values_list('total_amount', flat=True)),
+                         [Decimal("29.64"), Decimal("30.00")])
+
+    def test_int_and_float_inputs_are_converted_before_multiplying(self):
+        """
+        Test that totals are still filled in when quantity and unit price are given as ints or floats.
+        """
+        milk = IncomeCategory.objects.create(name="Milk Sales")
+        created = IncomeRecord.objects.create(date=date(2025, 1, 1), category=milk, description="Milk",
+                                              quantity=2, unit_price=3)
+        bulk, = IncomeRecord.objects.bulk_create([
+            IncomeRecord(date=date(2025, 1, 2), category=milk, description="Milk", quantity=2.5, unit_price=1.1),
+        ])
+        self.assertEqual(created.total_amount, Decimal("6.00"))
+        self.assertEqual(bulk.total_amount, Decimal("2.75"))
+
+
+# -------------------------
+# Profitability Summary Tests
+# -------------------------
+class ProfitabilitySummaryTest(TestCase):
+    def test_profitability_bulk_groups_by_month(self):
+        """
+        Test that each month in the range gets its own totals from grouped queries and reruns update in place.
+        """
+        from .utils import calculate_profitability_bulk
+        cache.clear()
+        direct = ExpenseCategory.objects.create(name="Feed", is_direct_cost=True)
+        indirect = ExpenseCategory.objects.create(name="Office", is_direct_cost=False)
+        milk = IncomeCategory.objects.create(name="Milk")
+        IncomeRecord.objects.create(date=date(2025, 1, 5), category=milk, description="Milk",
+                                    total_amount=Decimal("500.00"))
+        ExpenseRecord.objects.create(date=date(2025, 1, 6), category=direct, description="Feed",
+                                     amount=Decimal("200.00"))
+        ExpenseRecord.objects.create(date=date(2025, 1, 31), category=indirect, description="Paper",
+                                     amount=Decimal("50.00"))
+        ExpenseRecord.objects.create(date=date(2025, 3, 1), category=direct, description="Feed",
+                                     amount=Decimal("80.00"))
+
+        # Income, expenses, loan principal, asset purchases, total investment and the upsert
+        with self.assertNumQueries(6):
+            self.assertEqual(len(calculate_profitability_bulk(date(2025, 1, 20), date(2025, 3, 2))), 3)
+        january, february, march = Profitability.objects.order_by('year', 'month')
+        self.assertEqual((january.total_income, january.direct_costs, january.indirect_costs, january.net_profit),
+                         (Decimal("500.00"), Decimal("200.00"), Decimal("50.00"), Decimal("250.00")))
+        self.assertEqual(february.net_profit, Decimal("0.00"))
+        self.assertEqual(march.gross_profit, Decimal("-80.00"))
+
+        IncomeRecord.objects.create(date=date(2025, 3, 9), category=milk, description="Milk",
+                                    total_amount=Decimal("100.00"))
+        calculate_profitability_bulk(date(2025, 3, 1), date(2025, 3, 1))
+        self.assertEqual(Profitability.objects.count(), 3)
+        self.assertEqual(Profitability.objects.get(year=2025, month=3).net_profit, Decimal("20.00"))
+
+    def test_monthly_profitability_scans_expenses_once(self):
+        """
+        Test that the direct, indirect and depreciation costs of a month come from a single expense query.
+        """
+        from .utils import calculate_monthly_profitability
+        feed = ExpenseCategory.objects.create(name="Feed", is_direct_cost=True)
+        depreciation = ExpenseCategory.objects.create(name="Depreciation", is_direct_cost=False)
+        milk = IncomeCategory.objects.create(name="Milk")
+        IncomeRecord.objects.create(date=date(2025, 5, 2), category=milk, description="Milk",
+                                    total_amount=Decimal("900.00"))
+        ExpenseRecord.objects.create(date=date(2025, 5, 3), category=feed, description="Feed",
+                                     amount=Decimal("300.00"))
+        ExpenseRecord.objects.create(date=date(2025, 5, 31), category=depreciation, description="Tractor",
+                                     amount=Decimal("100.00"))
+
+        with CaptureQueriesContext(connection) as queries:
+            record = calculate_monthly_profitability(2025, 5)
+        self.assertEqual(len([q for q in queries if 'FROM "finance_expenserecord"' in q['sql']]), 1)
+        self.assertEqual((record.direct_costs, record.indirect_costs, record.net_profit, record.cash_surplus),
+                         (Decimal("300.00"), Decimal("100.00"), Decimal("500.00"), Decimal("600.00")))
+
+        # Recalculating upserts the same row with a single statement
+        with CaptureQueriesContext(connection) as queries:
+            again = calculate_monthly_profitability(2025, 5)
+        self.assertEqual(len([q for q in queries if '"finance_profitability"' in q['sql']]), 1)
+        self.assertEqual(again.pk, record.pk)
+        self.assertEqual(Profitability.objects.get().net_profit, Decimal("500.00"))
+
+    def test_profitability_bulk_runs_the_same_queries_for_any_number_of_months(self):
+        """
+        Test that a range of months is calculated with one grouped query per source and one upsert.
+        """
+        from assets.models import Asset
+        from .utils import calculate_profitability_bulk
+        cache.clear()
+        feed = ExpenseCategory.objects.create(name="Feed", is_direct_cost=True)
+        milk = IncomeCategory.objects.create(name="Milk")
+        IncomeRecord.objects.create(date=date(2025, 1, 10), category=milk, description="Milk",
+                                    total_amount=Decimal("1000.00"))
+        ExpenseRecord.objects.create(date=date(2025, 3, 3), category=feed, description="Feed",
+                                     amount=Decimal("200.00"))
+        Asset.objects.create(name="Chopper", category=Asset.CATEGORY_MACHINERY, purchase_date=date(2025, 1, 20),
+                             purchase_cost=Decimal("4000.00"), useful_life_years=5, salvage_value=Decimal("0.00"))
+
+        # Income, expenses, loan principal, asset purchases, total investment and the upsert
+        with self.assertNumQueries(6):
+            january, february, march = calculate_profitability_bulk(date(2025, 1, 1), date(2025, 3, 31))
+        self.assertEqual((january.net_profit, january.roi, january.cash_surplus),
+                         (Decimal("1000.00"), Decimal("25.00"), Decimal("-3000.00")))
+        self.assertEqual(february.net_profit, Decimal("0.00"))
+        self.assertEqual((march.net_profit, march.cash_surplus), (Decimal("-200.00"), Decimal("-200.00")))
+        self.assertEqual(Profitability.objects.count(), 3)
+
+
+# -------------------------
+# Finance Record List API Tests
+# -------------------------
+class FinanceRecordListAPITest(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="lister", password="lister"))
+        category = ExpenseCategory.objects.create(name="Feed")
+        for day in (1, 2, 3):
+            ExpenseRecord.objects.create(date=date(2025, 1, day), category=category, description=f"Feed {day}",
+                                         amount=Decimal("10.00"), supplier_vendor="Mill", notes="Long notes")
+
+    def test_expense_list_loads_only_list_columns(self):
+        """
+        Test that the expense list uses the list serializer with one SELECT joining the category, skipping notes.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("finance:expenserecord-list"))
+        self.assertEqual(response.status_code, 200)
+        first = response.data['results'][0]
+        self.assertEqual(set(first), {'expense_id', 'date', 'category', 'category_name', 'description', 'amount',
+                                      'supplier_vendor'})
+        self.assertEqual(first['category_name'], "Feed")
+        selects = [q['sql'] for q in queries if 'FROM "finance_expenserecord"' in q['sql'] and 'COUNT' not in q['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('"notes"', selects[0])
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT') and
+                          'FROM "finance_expensecategory"' in q['sql']])
+
+    def test_expense_list_query_count_does_not_grow_with_rows(self):
+        """
+        Test that the list runs the page COUNT and one joined SELECT, however many rows it returns.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("finance:expenserecord-list"))
+        self.assertEqual(response.data['count'], 3)
+
+    def test_expense_detail_returns_full_record(self):
+        """
+        Test that the detail returns the full record, with the category and buffalo breed joined in one SELECT.
+        """
+        from herd.models import Breed
+        buffalo = Buffalo.objects.create(buffalo_id="F1", breed=Breed.objects.create(name="Murrah"),
+                                         date_of_birth=date(2020, 1, 1), gender="FEMALE")
+        expense = ExpenseRecord.objects.first()
+        expense.related_buffalo = buffalo
+        expense.save()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("finance:expenserecord-detail", args=[expense.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['notes'], "Long notes")
+        self.assertEqual(response.data['related_buffalo_info']['breed_name'], "Murrah")
+
+
+# -------------------------
+# CSV Export Tests
+# -------------------------
+class FinanceExportTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        self.client.force_login(get_user_model().objects.create_user(username="exporter", password="exporter"))
+        category = ExpenseCategory.objects.create(name="Feed")
+        ExpenseRecord.objects.create(date=date(2025, 1, 5), category=category, description="Hay, baled",
+                                     amount=Decimal("45.00"), supplier_vendor="Mill")
+
+    def test_export_expenses_streams_csv(self):
+        """
+        Test that the expense export streams a header and one quoted CSV row per filtered record.
+        """
+        response = self.client.get(reverse("finance:export_expenses"), {'start_date': '2025-01-01'})
+        self.assertTrue(response.streaming)
+        self.assertIn('expenses_export_', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ['Date,Category,Description,Amount,Supplier/Vendor,Related Buffalo,Notes',
+                                 '2025-01-05,Feed,"Hay, baled",45.00,Mill,,'])
+
+
+# -------------------------
+# Profitability Task Queue Tests
+# -------------------------
+class ProfitabilityTaskQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_month_is_queued_once_until_the_task_runs(self):
+        """
+        Test that a month is queued once while its task is pending and can be queued again after the task runs.
+        """
+        from .tasks import queue_monthly_profitability, run_monthly_profitability_task
+        with mock.patch.object(run_monthly_profitability_task, 'delay') as delay:
+            self.assertTrue(queue_monthly_profitability(2025, 6))
+            self.assertFalse(queue_monthly_profitability(2025, 6))
+            delay.assert_called_once_with(2025, 6)
+
+            # Running the task releases the month for the next request
+            run_monthly_profitability_task(2025, 6)
+            self.assertTrue(queue_monthly_profitability(2025, 6))
+        self.assertTrue(Profitability.objects.filter(year=2025, month=6).exists())
+
+    def test_unreachable_broker_calculates_the_month_in_the_request(self):
+        """
+        Test that a broker error falls back to calculating the month in the request and releases its queue lock.
+        """
+        from django.contrib.auth import get_user_model
+        from django.contrib.messages import get_messages
+        from kombu.exceptions import OperationalError
+        from .tasks import queue_monthly_profitability, run_monthly_profitability_task
+        self.client.force_login(get_user_model().objects.create_user(username="planner", password="planner"))
+        with mock.patch.object(run_monthly_profitability_task, 'delay', side_effect=OperationalError('no broker')), \
+                self.assertLogs('finance.views', level='ERROR'):
+            response = self.client.post(reverse('finance:calculate_profitability'), {'year': 2025, 'month': 7})
+        self.assertRedirects(response, reverse('finance:profitability'), fetch_redirect_response=False)
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         ['Profitability has been calculated for 2025-07!'])
+        self.assertTrue(Profitability.objects.filter(year=2025, month=7).exists())
+        with mock.patch.object(run_monthly_profitability_task, 'delay'):
+            self.assertTrue(queue_monthly_profitability(2025, 7))
@@ -2,16 +2,18 @@
 urls.py
 
 This file defines URL patterns for the finance app.
-It includes both view-based URLs and DRF API endpoints (using a DefaultRouter).
+It includes both view-based URLs and DRF API endpoints (using a SimpleRouter).
 Each URL pattern is documented to explain its purpose.
 """
 
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
+from rest_framework.routers import SimpleRouter
 from . import views
 
 # Create a DRF router and register viewsets for API endpoints.
-router = DefaultRouter()
+# SimpleRouter skips the browsable API root view and the format-suffix variants of every route,
+# which these internal endpoints don't use.
+router = SimpleRouter()
 router.register(r'expense-categories', views.ExpenseCategoryViewSet)
 router.register(r'income-categories', views.IncomeCategoryViewSet)
 router.register(r'expenses', views.ExpenseRecordViewSet)
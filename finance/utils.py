@@ -3,15 +3,29 @@ finance/utils.py
 
 Provides utility functions for finance calculations.
 For example, calculate_monthly_profitability computes income, expenses, profits,
-ROI, and cash surplus for a given month.
+ROI, and cash surplus for a given month, and calculate_profitability_bulk does the same for a range of months.
 """
 
-from django.db.models import Sum
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from dateutil.relativedelta import relativedelta
+from decimal import Decimal
 from .models import IncomeRecord, ExpenseRecord, Profitability
 from assets.models import Asset  # Asset details to calculate total investment
 from finance.models import LoanPayment
 from datetime import date
-from calendar import monthrange
+
+
+PROFITABILITY_UPDATE_FIELDS = ['total_income', 'direct_costs', 'indirect_costs', 'gross_profit', 'net_profit', 'roi',
+                               'cash_surplus']
+
+
+def _sum_by_month(queryset, date_field, **aggregates):
+    """Runs the aggregates over the queryset grouped by the month of date_field; returns {month's 1st: row}."""
+    return {
+        row['month']: row for row in
+        queryset.annotate(month=TruncMonth(date_field)).order_by().values('month').annotate(**aggregates)
+    }
 
 
 def calculate_monthly_profitability(year, month):
@@ -30,53 +44,79 @@ def calculate_monthly_profitability(year, month):
     9. Retrieve capital expenditure (from Asset purchase costs during the month).
     10. Compute ROI based on total investment.
     11. Compute Cash Surplus = Net Profit + Depreciation - Principal Repayment - CapEx.
-    12. Update or create a Profitability record with these values.
+    12. Upsert the Profitability record with these values.
+
+    The work is done by calculate_profitability_bulk for the single month.
+    """
+    month_start = date(year, month, 1)
+    record, = calculate_profitability_bulk(month_start, month_start)
+    return record
+
+
+def calculate_profitability_bulk(start_date, end_date):
+    """
+    Runs calculate_monthly_profitability's calculation for every month from start_date's month to end_date's month.
+
+    Each source is summed per month in one GROUP BY query (income, expenses, loan principal, asset purchases),
+    and all months are written with one INSERT ... ON CONFLICT (year, month) upsert, so the number of queries
+    doesn't grow with the number of months. Returns the Profitability records in month order.
     """
-    start_date = date(year, month, 1)
-    end_date = date(year, month, monthrange(year, month)[1])
-
-    income = IncomeRecord.objects.filter(date__range=(start_date, end_date)).aggregate(total=Sum('total_amount'))[
-                 'total'] or 0
-    direct_costs = ExpenseRecord.objects.filter(
-        date__range=(start_date, end_date), category__is_direct_cost=True
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    indirect_costs = ExpenseRecord.objects.filter(
-        date__range=(start_date, end_date), category__is_direct_cost=False
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    gross_profit = income - direct_costs
-    net_profit = gross_profit - indirect_costs
-
-    # Depreciation is calculated as an expense under the 'Depreciation' category.
-    depreciation = ExpenseRecord.objects.filter(
-        date__range=(start_date, end_date), category__name='Depreciation'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    start = start_date.replace(day=1)
+    # Half-open range: up to, not including, the first day of the month after end_date's month
+    stop = end_date.replace(day=1) + relativedelta(months=1)
+
+    income_by_month = _sum_by_month(
+        IncomeRecord.objects.filter(date__gte=start, date__lt=stop), 'date', total=Sum('total_amount')
+    )
+    # Direct, indirect and depreciation costs come from one scan of the expenses.
+    costs_by_month = _sum_by_month(
+        ExpenseRecord.objects.filter(date__gte=start, date__lt=stop), 'date',
+        direct=Sum('amount', filter=Q(category__is_direct_cost=True)),
+        indirect=Sum('amount', filter=Q(category__is_direct_cost=False)),
+        # Depreciation is calculated as an expense under the 'Depreciation' category.
+        depreciation=Sum('amount', filter=Q(category__name='Depreciation')),
+    )
     # Principal repayment from loans
-    principal_repayment = LoanPayment.objects.filter(payment_date__range=(start_date, end_date)).aggregate(
+    principal_by_month = _sum_by_month(
+        LoanPayment.objects.filter(payment_date__gte=start, payment_date__lt=stop), 'payment_date',
         total=Sum('principal_component')
-    )['total'] or 0
+    )
     # Capital Expenditure; assets purchased in the period.
-    capex = Asset.objects.filter(purchase_date__range=(start_date, end_date)).aggregate(
+    capex_by_month = _sum_by_month(
+        Asset.objects.filter(purchase_date__gte=start, purchase_date__lt=stop), 'purchase_date',
         total=Sum('purchase_cost')
-    )['total'] or 0
-
-    total_investment = Asset.objects.aggregate(total=Sum('purchase_cost'))['total'] or 1  # Prevent division by zero
-    roi = (net_profit / total_investment) * 100 if total_investment else 0
-
-    cash_surplus = net_profit + depreciation - principal_repayment - capex
-
-    # Update or create the Profitability record.
-    record, _ = Profitability.objects.update_or_create(
-        year=year,
-        month=month,
-        defaults={
-            'total_income': income,
-            'direct_costs': direct_costs,
-            'indirect_costs': indirect_costs,
-            'gross_profit': gross_profit,
-            'net_profit': net_profit,
-            'roi': roi,
-            'cash_surplus': cash_surplus
-        }
     )
-    return record
+    total_investment = Asset.total_investment() or 1  # Prevent division by zero
+
+    records = []
+    month = start
+    while month < stop:
+        income = income_by_month.get(month, {}).get('total') or Decimal('0.00')
+        costs = costs_by_month.get(month, {})
+        direct_costs = costs.get('direct') or Decimal('0.00')
+        indirect_costs = costs.get('indirect') or Decimal('0.00')
+        depreciation = costs.get('depreciation') or Decimal('0.00')
+        principal_repayment = principal_by_month.get(month, {}).get('total') or Decimal('0.00')
+        capex = capex_by_month.get(month, {}).get('total') or Decimal('0.00')
+
+        gross_profit = income - direct_costs
+        net_profit = gross_profit - indirect_costs
+        records.append(Profitability(
+            year=month.year,
+            month=month.month,
+            total_income=income,
+            direct_costs=direct_costs,
+            indirect_costs=indirect_costs,
+            gross_profit=gross_profit,
+            net_profit=net_profit,
+            roi=(net_profit / total_investment) * 100,
+            cash_surplus=net_profit + depreciation - principal_repayment - capex
+        ))
+        month += relativedelta(months=1)
+
+    return Profitability.objects.bulk_create(
+        records,
+        update_conflicts=True,
+        unique_fields=['year', 'month'],
+        update_fields=PROFITABILITY_UPDATE_FIELDS,
+    )
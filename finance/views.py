@@ -9,26 +9,58 @@ and business logic applied.
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
-from django.db.models import Sum, Count
+from django.db import transaction
+from django.db.models import Sum, Count, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from rest_framework import viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-import csv, io, json
+import csv, json
+import logging
 from datetime import date, timedelta
 from dateutil.relativedelta import relativedelta
+from kombu.exceptions import OperationalError as BrokerError
 from decimal import Decimal
 
 from .models import ExpenseCategory, IncomeCategory, ExpenseRecord, IncomeRecord, Profitability
 from .forms import ExpenseCategoryForm, IncomeCategoryForm, ExpenseRecordForm, IncomeRecordForm, MilkIncomeGeneratorForm
+from .utils import calculate_monthly_profitability, calculate_profitability_bulk
+from .tasks import queue_monthly_profitability
 from .serializers import ExpenseCategorySerializer, IncomeCategorySerializer, ExpenseRecordSerializer, \
-    IncomeRecordSerializer, ProfitabilitySerializer
+    ExpenseRecordListSerializer, IncomeRecordSerializer, IncomeRecordListSerializer, ProfitabilitySerializer
 from herd.models import MilkProduction
 from configuration.models import GlobalSettings
 
+logger = logging.getLogger(__name__)
+
+
+# ---------------- CSV Export Helpers ----------------
+class _Echo:
+    """File-like object whose write() hands back the line, so csv.writer can produce rows for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def _stream_csv(filename, header, rows):
+    """
+    Streams a CSV download: header, then one line per item of rows.
+    Lines are produced as the response is sent, so large exports aren't built in memory first.
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    return StreamingHttpResponse(lines(), content_type='text/csv',
+                                 headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 
 # ---------------- Expense Category Views ----------------
 @login_required
@@ -37,11 +69,11 @@ def expense_category_list(request):
     Displays a list of all Expense Categories.
     Also calculates the count and total expense for each category.
     """
-    categories = ExpenseCategory.objects.all()
-    for category in categories:
-        category.expense_count = ExpenseRecord.objects.filter(category=category).count()
-        category.expense_total = ExpenseRecord.objects.filter(category=category).aggregate(total=Sum('amount'))[
-                                     'total'] or 0
+    # Count and total every category's expenses in the same query as the categories.
+    categories = ExpenseCategory.objects.annotate(
+        expense_count=Count('expenses'),
+        expense_total=Coalesce(Sum('expenses__amount'), Value(Decimal('0.00'))),
+    )
     context = {'title': 'Expense Categories', 'categories': categories}
     return render(request, 'dairy_erp/finance/expense_category_list.html', context)
 
@@ -89,11 +121,11 @@ def income_category_list(request):
     """
     Displays all Income Categories and aggregates the number and total income for each.
     """
-    categories = IncomeCategory.objects.all()
-    for category in categories:
-        category.income_count = IncomeRecord.objects.filter(category=category).count()
-        category.income_total = IncomeRecord.objects.filter(category=category).aggregate(total=Sum('total_amount'))[
-                                    'total'] or 0
+    # Count and total every category's income in the same query as the categories.
+    categories = IncomeCategory.objects.annotate(
+        income_count=Count('income_records'),
+        income_total=Coalesce(Sum('income_records__total_amount'), Value(Decimal('0.00'))),
+    )
     context = {'title': 'Income Categories', 'categories': categories}
     return render(request, 'dairy_erp/finance/income_category_list.html', context)
 
@@ -146,7 +178,8 @@ def expense_list(request):
     end_date = request.GET.get('end_date', today.isoformat())
     category_id = request.GET.get('category_id', '')
 
-    expenses = ExpenseRecord.objects.all()
+    # The table shows each expense's category; join it instead of querying it per row.
+    expenses = ExpenseRecord.objects.select_related('category')
     if start_date:
         expenses = expenses.filter(date__gte=start_date)
     if end_date:
@@ -154,7 +187,7 @@ def expense_list(request):
     if category_id:
         expenses = expenses.filter(category_id=category_id)
     categories = ExpenseCategory.objects.all()
-    total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or 0
+    total_expenses = expenses.aggregate(total=Coalesce(Sum('amount'), Value(Decimal('0.00'))))['total']
 
     # Prepare chart data by aggregating expenses by category.
     expense_breakdown = expenses.values('category__name').annotate(
@@ -183,14 +216,16 @@ def expense_add(request):
     View to add a new Expense Record.
     On GET, displays a form pre-filled with current date.
     """
+    # Form class with the currently defined custom fields declared on it.
+    form_class = ExpenseRecordForm.for_custom_fields()
     if request.method == 'POST':
-        form = ExpenseRecordForm(request.POST)
+        form = form_class(request.POST)
         if form.is_valid():
             form.save()
             messages.success(request, 'Expense record has been added successfully!')
             return redirect('finance:expense_list')
     else:
-        form = ExpenseRecordForm(initial={'date': timezone.now().date()})
+        form = form_class(initial={'date': timezone.now().date()})
     context = {'title': 'Add Expense', 'form': form}
     return render(request, 'dairy_erp/finance/expense_form.html', context)
 
@@ -201,14 +236,16 @@ def expense_edit(request, expense_id):
     View to edit an existing Expense Record.
     """
     expense = get_object_or_404(ExpenseRecord, id=expense_id)
+    # Form class with the currently defined custom fields declared on it.
+    form_class = ExpenseRecordForm.for_custom_fields()
     if request.method == 'POST':
-        form = ExpenseRecordForm(request.POST, instance=expense)
+        form = form_class(request.POST, instance=expense)
         if form.is_valid():
             form.save()
             messages.success(request, 'Expense record has been updated successfully!')
             return redirect('finance:expense_list')
     else:
-        form = ExpenseRecordForm(instance=expense)
+        form = form_class(instance=expense)
     context = {'title': 'Edit Expense', 'form': form, 'expense': expense}
     return render(request, 'dairy_erp/finance/expense_form.html', context)
 
@@ -236,7 +273,7 @@ def export_expenses(request):
     end_date = request.GET.get('end_date', '')
     category_id = request.GET.get('category_id', '')
 
-    expenses = ExpenseRecord.objects.all()
+    expenses = ExpenseRecord.objects.select_related('category', 'related_buffalo')
     if start_date:
         expenses = expenses.filter(date__gte=start_date)
     if end_date:
@@ -244,11 +281,12 @@ def export_expenses(request):
     if category_id:
         expenses = expenses.filter(category_id=category_id)
 
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerow(['Date', 'Category', 'Description', 'Amount', 'Supplier/Vendor', 'Related Buffalo', 'Notes'])
-    for expense in expenses:
-        writer.writerow([
+    expenses = expenses.only(
+        'date', 'category__name', 'description', 'amount', 'supplier_vendor',
+        'related_buffalo__buffalo_id', 'related_buffalo__name', 'notes'
+    )
+    rows = (
+        [
             expense.date,
             expense.category.name,
             expense.description,
@@ -256,12 +294,14 @@ def export_expenses(request):
             expense.supplier_vendor or '',
             str(expense.related_buffalo) if expense.related_buffalo else '',
             expense.notes or ''
-        ])
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='text/csv')
-    response[
-        'Content-Disposition'] = f'attachment; filename="expenses_export_{timezone.now().strftime("%Y_%m_%d")}.csv"'
-    return response
+        ]
+        for expense in expenses.iterator(chunk_size=2000)
+    )
+    return _stream_csv(
+        f'expenses_export_{timezone.now().strftime("%Y_%m_%d")}.csv',
+        ['Date', 'Category', 'Description', 'Amount', 'Supplier/Vendor', 'Related Buffalo', 'Notes'],
+        rows
+    )
 
 
 # ---------------- Income Record Views ----------------
@@ -277,7 +317,8 @@ def income_list(request):
     end_date = request.GET.get('end_date', today.isoformat())
     category_id = request.GET.get('category_id', '')
 
-    income_records = IncomeRecord.objects.all()
+    # The table shows each record's category; join it instead of querying it per row.
+    income_records = IncomeRecord.objects.select_related('category')
     if start_date:
         income_records = income_records.filter(date__gte=start_date)
     if end_date:
@@ -285,7 +326,7 @@ def income_list(request):
     if category_id:
         income_records = income_records.filter(category_id=category_id)
     categories = IncomeCategory.objects.all()
-    total_income = income_records.aggregate(total=Sum('total_amount'))['total'] or 0
+    total_income = income_records.aggregate(total=Coalesce(Sum('total_amount'), Value(Decimal('0.00'))))['total']
 
     # Chart data aggregation: group income by category.
     income_breakdown = income_records.values('category__name').annotate(total=Sum('total_amount')).order_by('-total')
@@ -312,14 +353,16 @@ def income_add(request):
     View to add a new Income Record.
     Uses the IncomeRecordForm and sets the default date.
     """
+    # Form class with the currently defined custom fields declared on it.
+    form_class = IncomeRecordForm.for_custom_fields()
     if request.method == 'POST':
-        form = IncomeRecordForm(request.POST)
+        form = form_class(request.POST)
         if form.is_valid():
             form.save()
             messages.success(request, 'Income record has been added successfully!')
             return redirect('finance:income_list')
     else:
-        form = IncomeRecordForm(initial={'date': timezone.now().date()})
+        form = form_class(initial={'date': timezone.now().date()})
     context = {'title': 'Add Income', 'form': form}
     return render(request, 'dairy_erp/finance/income_form.html', context)
 
@@ -330,14 +373,16 @@ def income_edit(request, income_id):
     View to edit an existing Income Record.
     """
     income = get_object_or_404(IncomeRecord, id=income_id)
+    # Form class with the currently defined custom fields declared on it.
+    form_class = IncomeRecordForm.for_custom_fields()
     if request.method == 'POST':
-        form = IncomeRecordForm(request.POST, instance=income)
+        form = form_class(request.POST, instance=income)
         if form.is_valid():
             form.save()
             messages.success(request, 'Income record has been updated successfully!')
             return redirect('finance:income_list')
     else:
-        form = IncomeRecordForm(instance=income)
+        form = form_class(instance=income)
     context = {'title': 'Edit Income', 'form': form, 'income': income}
     return render(request, 'dairy_erp/finance/income_form.html', context)
 
@@ -365,7 +410,7 @@ def export_income(request):
     end_date = request.GET.get('end_date', '')
     category_id = request.GET.get('category_id', '')
 
-    income_records = IncomeRecord.objects.all()
+    income_records = IncomeRecord.objects.select_related('category', 'related_buffalo')
     if start_date:
         income_records = income_records.filter(date__gte=start_date)
     if end_date:
@@ -373,13 +418,12 @@ def export_income(request):
     if category_id:
         income_records = income_records.filter(category_id=category_id)
 
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerow(
-        ['Date', 'Category', 'Description', 'Quantity', 'Unit Price', 'Total Amount', 'Customer', 'Related Buffalo',
-         'Notes'])
-    for income in income_records:
-        writer.writerow([
+    income_records = income_records.only(
+        'date', 'category__name', 'description', 'quantity', 'unit_price', 'total_amount', 'customer',
+        'related_buffalo__buffalo_id', 'related_buffalo__name', 'notes'
+    )
+    rows = (
+        [
             income.date,
             income.category.name,
             income.description,
@@ -389,11 +433,15 @@ def export_income(request):
             income.customer or '',
             str(income.related_buffalo) if income.related_buffalo else '',
             income.notes or ''
-        ])
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="income_export_{timezone.now().strftime("%Y_%m_%d")}.csv"'
-    return response
+        ]
+        for income in income_records.iterator(chunk_size=2000)
+    )
+    return _stream_csv(
+        f'income_export_{timezone.now().strftime("%Y_%m_%d")}.csv',
+        ['Date', 'Category', 'Description', 'Quantity', 'Unit Price', 'Total Amount', 'Customer', 'Related Buffalo',
+         'Notes'],
+        rows
+    )
 
 
 @login_required
@@ -411,37 +459,43 @@ def milk_income_generator(request):
             milk_price = form.cleaned_data['milk_price']
             customer = form.cleaned_data['customer']
 
-            # Retrieve milk production data between the provided dates.
-            milk_production = MilkProduction.objects.filter(date__gte=start_date, date__lte=end_date)
-            milk_by_date = {}
-            for record in milk_production:
-                date_key = record.date
-                # Accumulate milk production using Decimal for precision.
-                milk_by_date[date_key] = milk_by_date.get(date_key, Decimal('0.00')) + record.quantity_litres
+            # Total the milk production per date in the database.
+            milk_by_date = (
+                MilkProduction.objects.filter(date__gte=start_date, date__lte=end_date)
+                .values('date')
+                .annotate(quantity=Sum('quantity_litres'))
+                .order_by('date')
+            )
+            # Skip dates that already have a "Milk Sales" income record.
+            existing_dates = set(
+                IncomeRecord.objects.filter(
+                    date__gte=start_date, date__lte=end_date, category__name='Milk Sales'
+                ).values_list('date', flat=True)
+            )
+            pending = [row for row in milk_by_date if row['date'] not in existing_dates]
 
             records_created = 0
-            # For each date, create an income record if one for "Milk Sales" does not exist.
-            for record_date, quantity in milk_by_date.items():
-                existing = IncomeRecord.objects.filter(
-                    date=record_date,
-                    category__name='Milk Sales'
-                ).exists()
-                if not existing:
-                    milk_category, created = IncomeCategory.objects.get_or_create(
-                        name='Milk Sales',
-                        defaults={'description': 'Income from selling milk'}
-                    )
-                    IncomeRecord.objects.create(
-                        date=record_date,
+            if pending:
+                milk_category, created = IncomeCategory.objects.get_or_create(
+                    name='Milk Sales',
+                    defaults={'description': 'Income from selling milk'}
+                )
+                # IncomeRecord.objects.bulk_create() computes total_amount from quantity and unit_price.
+                records = [
+                    IncomeRecord(
+                        date=row['date'],
                         category=milk_category,
-                        description=f'Milk sales for {record_date.strftime("%Y-%m-%d")}',
-                        quantity=quantity,
+                        description=f'Milk sales for {row["date"].strftime("%Y-%m-%d")}',
+                        quantity=row['quantity'],
                         unit_price=milk_price,
-                        total_amount=quantity * milk_price,
                         customer=customer,
                         notes='Auto-generated from milk production records'
                     )
-                    records_created += 1
+                    for row in pending
+                ]
+                with transaction.atomic():
+                    IncomeRecord.objects.bulk_create(records, batch_size=500)
+                records_created = len(records)
             messages.success(request, f'{records_created} income records have been generated!')
             return redirect('finance:income_list')
     else:
@@ -467,33 +521,7 @@ def profitability(request):
 
     # If no profitability records exist, calculate and create them.
     if not profitability_records.exists():
-        current_date = start_date
-        while current_date <= today:
-            year = current_date.year
-            month = current_date.month
-            income = \
-            IncomeRecord.objects.filter(date__year=year, date__month=month).aggregate(total=Sum('total_amount'))[
-                'total'] or Decimal('0.00')
-            direct_expenses = ExpenseRecord.objects.filter(
-                date__year=year, date__month=month, category__is_direct_cost=True
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            indirect_expenses = ExpenseRecord.objects.filter(
-                date__year=year, date__month=month, category__is_direct_cost=False
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            gross_profit = income - direct_expenses
-            net_profit = gross_profit - indirect_expenses
-            Profitability.objects.create(
-                year=year,
-                month=month,
-                total_income=income,
-                direct_costs=direct_expenses,
-                indirect_costs=indirect_expenses,
-                gross_profit=gross_profit,
-                net_profit=net_profit,
-                roi=0,
-                cash_surplus=0
-            )
-            current_date += relativedelta(months=1)
+        calculate_profitability_bulk(start_date, today)
         profitability_records = Profitability.objects.filter(year__gte=start_date.year).order_by('year', 'month')
 
     # Prepare chart data for display on the dashboard.
@@ -541,34 +569,23 @@ def profitability(request):
 def calculate_profitability(request):
     """
     Manually triggers the recalculation of profitability for a specific month.
-    Expects 'year' and 'month' in POST data and updates/creates a Profitability record.
+    Expects 'year' and 'month' in POST data. The calculation runs as a celery task on the reports queue,
+    and repeated requests for a month that is already queued don't queue it again.
+    If the broker can't be reached, the month is calculated within the request instead.
     """
     year = int(request.POST.get('year'))
     month = int(request.POST.get('month'))
-    income = IncomeRecord.objects.filter(date__year=year, date__month=month).aggregate(total=Sum('total_amount'))[
-                 'total'] or Decimal('0.00')
-    direct_expenses = ExpenseRecord.objects.filter(
-        date__year=year, date__month=month, category__is_direct_cost=True
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    indirect_expenses = ExpenseRecord.objects.filter(
-        date__year=year, date__month=month, category__is_direct_cost=False
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    gross_profit = income - direct_expenses
-    net_profit = gross_profit - indirect_expenses
-    Profitability.objects.update_or_create(
-        year=year,
-        month=month,
-        defaults={
-            'total_income': income,
-            'direct_costs': direct_expenses,
-            'indirect_costs': indirect_expenses,
-            'gross_profit': gross_profit,
-            'net_profit': net_profit,
-            'roi': 0,
-            'cash_surplus': 0
-        }
-    )
-    messages.success(request, f'Profitability has been calculated for {year}-{month:02d}!')
+    try:
+        queued = queue_monthly_profitability(year, month)
+    except BrokerError:
+        logger.exception('Could not queue profitability for %s-%02d; calculating it in the request', year, month)
+        calculate_monthly_profitability(year, month)
+        messages.success(request, f'Profitability has been calculated for {year}-{month:02d}!')
+        return redirect('finance:profitability')
+    if queued:
+        messages.success(request, f'Profitability for {year}-{month:02d} is being calculated and will appear shortly.')
+    else:
+        messages.info(request, f'Profitability for {year}-{month:02d} is already being calculated.')
     return redirect('finance:profitability')
 
 
@@ -598,25 +615,53 @@ class ExpenseRecordViewSet(viewsets.ModelViewSet):
     """
     API endpoint for ExpenseRecord.
     Provides filtering by category, date, or related buffalo.
+    Lists use the slim list serializer and load only its columns; other actions return the full record.
     """
-    queryset = ExpenseRecord.objects.all()
+    # The full serializer reads the category name and the related buffalo with its breed name
+    queryset = ExpenseRecord.objects.select_related('category', 'related_buffalo__breed')
     serializer_class = ExpenseRecordSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['category', 'date', 'related_buffalo']
     ordering_fields = ['date', 'amount']
 
+    def get_queryset(self):
+        if self.action == 'list':
+            return ExpenseRecord.objects.select_related('category').only(
+                'expense_id', 'date', 'category__name', 'description', 'amount', 'supplier_vendor'
+            )
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ExpenseRecordListSerializer
+        return super().get_serializer_class()
+
 
 class IncomeRecordViewSet(viewsets.ModelViewSet):
     """
     API endpoint for IncomeRecord.
     Allows filtering by category, date, or related buffalo.
+    Lists use the slim list serializer and load only its columns; other actions return the full record.
     """
-    queryset = IncomeRecord.objects.all()
+    # The full serializer reads the category name and the related buffalo with its breed name
+    queryset = IncomeRecord.objects.select_related('category', 'related_buffalo__breed')
     serializer_class = IncomeRecordSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['category', 'date', 'related_buffalo']
     ordering_fields = ['date', 'total_amount']
 
+    def get_queryset(self):
+        if self.action == 'list':
+            return IncomeRecord.objects.select_related('category').only(
+                'income_id', 'date', 'category__name', 'description', 'total_amount', 'customer'
+            )
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return IncomeRecordListSerializer
+        return super().get_serializer_class()
+
 
 class ProfitabilityViewSet(viewsets.ModelViewSet):
     """
@@ -635,17 +680,14 @@ def export_profitability(request):
     Exports all profitability records to CSV.
     """
     records = Profitability.objects.all().order_by('-year', '-month')
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerow(
+    rows = (
+        [r.year, r.month, r.total_income, r.direct_costs, r.indirect_costs, r.gross_profit, r.net_profit, r.roi,
+         r.cash_surplus]
+        for r in records.iterator(chunk_size=2000)
+    )
+    return _stream_csv(
+        f'profitability_{date.today().isoformat()}.csv',
         ['Year', 'Month', 'Total Income', 'Direct Costs', 'Indirect Costs', 'Gross Profit', 'Net Profit', 'ROI (%)',
-         'Cash Surplus'])
-    for r in records:
-        writer.writerow([
-            r.year, r.month, r.total_income, r.direct_costs, r.indirect_costs,
-            r.gross_profit, r.net_profit, r.roi, r.cash_surplus
-        ])
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="profitability_{date.today().isoformat()}.csv"'
-    return response
+         'Cash Surplus'],
+        rows
+    )
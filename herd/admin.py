@@ -36,6 +36,7 @@ class BuffaloAdmin(admin.ModelAdmin):
 @admin.register(LifecycleEvent)
 class LifecycleEventAdmin(admin.ModelAdmin):
     list_display = ('buffalo', 'event_type', 'event_date', 'get_related_calf_display')
+    list_select_related = ('buffalo', 'related_calf')
     list_filter = ('event_type', 'event_date')
     search_fields = ('buffalo__buffalo_id', 'buffalo__name', 'notes')
     date_hierarchy = 'event_date'
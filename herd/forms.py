@@ -1,21 +1,47 @@
 from django import forms
 from .models import Buffalo, Breed, LifecycleEvent, MilkProduction
 from configuration.models import CustomFieldDefinition
+from core.forms import BootstrapFormMixin, CustomFieldFormMixin
 
 
-class BreedForm(forms.ModelForm):
+class ActiveBuffaloChoiceIterator(forms.models.ModelChoiceIterator):
+    """Yields the options from Buffalo.active_for_choices() instead of running the field's queryset."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for buffalo in Buffalo.active_for_choices():
+            yield self.choice(buffalo)
+
+    def __len__(self):
+        return len(Buffalo.active_for_choices()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(Buffalo.active_for_choices())
+
+
+class ActiveBuffaloChoiceField(forms.ModelChoiceField):
+    """
+    Choice field over the active buffaloes.
+    The options are rendered from the cached list; only validating a submitted value queries the database.
+    """
+    iterator = ActiveBuffaloChoiceIterator
+
+    def __init__(self, queryset=None, **kwargs):
+        # Model forms pass the foreign key's full queryset; submitted values are always checked against active ones
+        super().__init__(queryset=Buffalo.objects.active(), **kwargs)
+
+
+class BreedForm(BootstrapFormMixin, forms.ModelForm):
     class Meta:
         model = Breed
         fields = ['name', 'description']
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Add Bootstrap classes
-        for field in self.fields:
-            self.fields[field].widget.attrs.update({'class': 'form-control'})
 
+class BuffaloForm(CustomFieldFormMixin, BootstrapFormMixin, forms.ModelForm):
+    """BuffaloForm.for_custom_fields() adds any custom fields defined for the "BUFFALO" target model."""
+    custom_field_target = CustomFieldDefinition.TARGET_BUFFALO
 
-class BuffaloForm(forms.ModelForm):
     class Meta:
         model = Buffalo
         fields = ['buffalo_id', 'name', 'breed', 'date_of_birth', 'gender',
@@ -28,99 +54,26 @@ class BuffaloForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Add Bootstrap classes
-        for field in self.fields:
-            self.fields[field].widget.attrs.update({'class': 'form-control'})
-
         # Filter dam choices to only include female buffaloes
         self.fields['dam'].queryset = Buffalo.objects.filter(gender='FEMALE')
 
         # Filter sire choices to only include male buffaloes
         self.fields['sire'].queryset = Buffalo.objects.filter(gender='MALE')
 
-        # Add custom fields if any
-        custom_fields = CustomFieldDefinition.objects.filter(target_model='BUFFALO')
-
-        for cf in custom_fields:
-            field_name = f"custom_{cf.field_name}"
-
-            # Get initial value if this is an edit form
-            initial_value = None
-            if self.instance.pk and cf.field_name in self.instance.custom_data:
-                initial_value = self.instance.custom_data[cf.field_name]
-
-            # Create appropriate field based on type
-            if cf.field_type == 'TEXT':
-                self.fields[field_name] = forms.CharField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.TextInput(attrs={'class': 'form-control'})
-                )
-            elif cf.field_type == 'NUMBER':
-                self.fields[field_name] = forms.DecimalField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.NumberInput(attrs={'class': 'form-control'})
-                )
-            elif cf.field_type == 'DATE':
-                self.fields[field_name] = forms.DateField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
-                )
-            elif cf.field_type == 'BOOLEAN':
-                self.fields[field_name] = forms.BooleanField(
-                    label=cf.field_label,
-                    required=cf.is_required,
-                    initial=initial_value,
-                    widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
-                )
-
-    def save(self, commit=True):
-        instance = super().save(commit=False)
-
-        # Save custom fields to custom_data JSON field
-        custom_fields = CustomFieldDefinition.objects.filter(target_model='BUFFALO')
-
-        for cf in custom_fields:
-            field_name = f"custom_{cf.field_name}"
-            if field_name in self.cleaned_data:
-                # Convert date objects to strings for JSON storage
-                value = self.cleaned_data[field_name]
-                if isinstance(value, (forms.fields.datetime.date, forms.fields.datetime.datetime)):
-                    value = value.isoformat()
-
-                # Update the custom_data dictionary
-                instance.custom_data[cf.field_name] = value
-
-        if commit:
-            instance.save()
-
-        return instance
-
-
-class LifecycleEventForm(forms.ModelForm):
+
+class LifecycleEventForm(BootstrapFormMixin, forms.ModelForm):
     class Meta:
         model = LifecycleEvent
         fields = ['buffalo', 'event_type', 'event_date', 'notes', 'related_calf']
         widgets = {
             'event_date': forms.DateInput(attrs={'type': 'date'}),
+            # Initially hidden (shown via JavaScript when event_type is 'CALVING')
+            'related_calf': forms.Select(attrs={'style': 'display:none;'}),
         }
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Add Bootstrap classes
-        for field in self.fields:
-            self.fields[field].widget.attrs.update({'class': 'form-control'})
-
         # Only show active buffaloes
-        self.fields['buffalo'].queryset = Buffalo.objects.filter(is_active=True)
-
-        # Initially hide related_calf field (will be shown via JavaScript when event_type is 'CALVING')
-        self.fields['related_calf'].widget.attrs.update({'class': 'form-control', 'style': 'display:none;'})
+        field_classes = {
+            'buffalo': ActiveBuffaloChoiceField,
+        }
 
     def clean(self):
         cleaned_data = super().clean()
@@ -143,7 +96,7 @@ class LifecycleEventForm(forms.ModelForm):
         return cleaned_data
 
 
-class MilkProductionForm(forms.ModelForm):
+class MilkProductionForm(BootstrapFormMixin, forms.ModelForm):
     class Meta:
         model = MilkProduction
         fields = ['buffalo', 'date', 'time_of_day', 'quantity_litres', 'somatic_cell_count', 'notes']
@@ -153,12 +106,8 @@ class MilkProductionForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Add Bootstrap classes
-        for field in self.fields:
-            self.fields[field].widget.attrs.update({'class': 'form-control'})
-
         # Only show active, milking buffaloes
-        self.fields['buffalo'].queryset = Buffalo.objects.filter(is_active=True, status='MILKING')
+        self.fields['buffalo'].queryset = Buffalo.objects.by_status(Buffalo.STATUS_MILKING)
 
     def clean(self):
         cleaned_data = super().clean()
@@ -181,7 +130,7 @@ class MilkProductionBatchForm(forms.Form):
         super().__init__(*args, **kwargs)
 
         # Get all active, milking buffaloes
-        milking_buffaloes = Buffalo.objects.filter(is_active=True, status='MILKING')
+        milking_buffaloes = Buffalo.objects.by_status(Buffalo.STATUS_MILKING)
 
         # Add a field for each buffalo
         for buffalo in milking_buffaloes:
@@ -1,10 +1,14 @@
+from django.core.cache import cache
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 import datetime
 
+ACTIVE_BUFFALOES_CACHE_KEY = 'herd:active_buffaloes'
+ACTIVE_BUFFALOES_CACHE_TIMEOUT = 300
+
 
 class Breed(models.Model):
     """Model for animal breeds."""
@@ -19,6 +23,19 @@ class Breed(models.Model):
         verbose_name_plural = _('Breeds')
 
 
+class BuffaloQuerySet(models.QuerySet):
+    def active(self):
+        """Buffaloes still part of the herd."""
+        return self.filter(is_active=True)
+
+    def by_status(self, status):
+        """Active buffaloes in the given status, e.g. Buffalo.STATUS_MILKING."""
+        return self.active().filter(status=status)
+
+
+BuffaloManager = models.Manager.from_queryset(BuffaloQuerySet)
+
+
 class Buffalo(models.Model):
     """Model for buffalo/cattle inventory."""
     # Status choices
@@ -76,6 +93,8 @@ class Buffalo(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BuffaloManager()
+
     def __str__(self):
         return f"{self.buffalo_id} - {self.name or 'Unnamed'}"
 
@@ -95,6 +114,15 @@ class Buffalo(models.Model):
             return (today - self.date_last_calved).days
         return None
 
+    @classmethod
+    def active_for_choices(cls):
+        """Active buffaloes with only the columns their labels need, cached until any buffalo is saved or deleted"""
+        buffaloes = cache.get(ACTIVE_BUFFALOES_CACHE_KEY)
+        if buffaloes is None:
+            buffaloes = list(cls.objects.active().only('buffalo_id', 'name'))
+            cache.set(ACTIVE_BUFFALOES_CACHE_KEY, buffaloes, ACTIVE_BUFFALOES_CACHE_TIMEOUT)
+        return buffaloes
+
     def update_status_from_lifecycle_event(self, event_type, event_date):
         """Update buffalo status based on lifecycle event."""
         if event_type == 'CALVING':
@@ -136,6 +164,16 @@ class Buffalo(models.Model):
         verbose_name = _('Buffalo')
         verbose_name_plural = _('Buffaloes')
         ordering = ['buffalo_id']
+        indexes = [
+            # Backs the active-herd status counts on the dashboard
+            models.Index(fields=['is_active', 'status'], name='buffalo_active_status_idx'),
+        ]
+
+
+@receiver([post_save, post_delete], sender=Buffalo)
+def clear_active_buffaloes_cache(sender, instance, **kwargs):
+    """Drop the cached choice list so dropdowns pick up added, renamed, sold or deleted buffaloes."""
+    cache.delete(ACTIVE_BUFFALOES_CACHE_KEY)
 
 
 class LifecycleEvent(models.Model):
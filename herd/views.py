@@ -33,10 +33,10 @@ def buffalo_list(request):
         buffaloes = buffaloes.filter(breed_id=breed_filter)
 
     # Summary statistics
-    total_count = Buffalo.objects.filter(is_active=True).count()
-    milking_count = Buffalo.objects.filter(is_active=True, status='MILKING').count()
-    pregnant_count = Buffalo.objects.filter(is_active=True, status='PREGNANT').count()
-    dry_count = Buffalo.objects.filter(is_active=True, status='DRY').count()
+    total_count = Buffalo.objects.active().count()
+    milking_count = Buffalo.objects.by_status(Buffalo.STATUS_MILKING).count()
+    pregnant_count = Buffalo.objects.by_status(Buffalo.STATUS_PREGNANT).count()
+    dry_count = Buffalo.objects.by_status(Buffalo.STATUS_DRY).count()
 
     # Get all breeds for the filter dropdown
     breeds = Breed.objects.all()
@@ -114,7 +114,7 @@ def buffalo_detail(request, buffalo_id):
 def buffalo_add(request):
     """Add a new buffalo"""
     if request.method == 'POST':
-        form = BuffaloForm(request.POST, request.FILES)
+        form = BuffaloForm.for_custom_fields()(request.POST, request.FILES)
         if form.is_valid():
             buffalo = form.save()
 
@@ -138,7 +138,7 @@ def buffalo_add(request):
             messages.success(request, f'Buffalo {buffalo} has been added successfully!')
             return redirect('herd:buffalo_detail', buffalo_id=buffalo.id)
     else:
-        form = BuffaloForm()
+        form = BuffaloForm.for_custom_fields()()
 
     context = {
         'title': 'Add Buffalo',
@@ -153,13 +153,13 @@ def buffalo_edit(request, buffalo_id):
     buffalo = get_object_or_404(Buffalo, id=buffalo_id)
 
     if request.method == 'POST':
-        form = BuffaloForm(request.POST, request.FILES, instance=buffalo)
+        form = BuffaloForm.for_custom_fields()(request.POST, request.FILES, instance=buffalo)
         if form.is_valid():
             form.save()
             messages.success(request, f'Buffalo {buffalo} has been updated successfully!')
             return redirect('herd:buffalo_detail', buffalo_id=buffalo.id)
     else:
-        form = BuffaloForm(instance=buffalo)
+        form = BuffaloForm.for_custom_fields()(instance=buffalo)
 
     context = {
         'title': 'Edit Buffalo',
@@ -309,7 +309,7 @@ def milk_production_list(request):
         milk_records = milk_records.filter(buffalo_id=buffalo_id)
 
     # Get all active, milking buffaloes for the filter dropdown
-    milking_buffaloes = Buffalo.objects.filter(is_active=True, status='MILKING')
+    milking_buffaloes = Buffalo.objects.by_status(Buffalo.STATUS_MILKING)
 
     # Calculate totals
     total_milk = milk_records.aggregate(total=Sum('quantity_litres'))['total'] or 0
@@ -279,7 +279,7 @@ class HealthRecordListView(LoginRequiredMixin, ListView):
         try:
             # Try to import Buffalo model
             from herd.models import Buffalo
-            context['buffaloes'] = Buffalo.objects.filter(is_active=True)
+            context['buffaloes'] = Buffalo.objects.active()
         except (ImportError, Exception):
             context['buffaloes'] = []
 
@@ -506,7 +506,7 @@ class AppointmentListView(LoginRequiredMixin, ListView):
         try:
             # Try to import Buffalo model
             from herd.models import Buffalo
-            context['buffaloes'] = Buffalo.objects.filter(is_active=True)
+            context['buffaloes'] = Buffalo.objects.active()
         except (ImportError, Exception):
             context['buffaloes'] = []
 